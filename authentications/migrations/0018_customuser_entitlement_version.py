@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentications', '0017_userprofile_google_profile_picture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='entitlement_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
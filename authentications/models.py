@@ -37,6 +37,8 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     is_verified = models.BooleanField(default=False)
+    # Bumped on every subscription change; access tokens carrying an older entitlement claim are refused
+    entitlement_version = models.PositiveIntegerField(default=0)
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
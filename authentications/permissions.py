@@ -0,0 +1,27 @@
+# authentications/permissions.py
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission
+
+from .tokens import ENTITLEMENT_CLAIM, is_premium, token_entitlement
+
+
+class HasPremiumEntitlement(BasePermission):
+    """
+    Premium-only endpoints. Reads the entitlement claim of the access token
+    instead of querying Subscription. A token issued before the user's last
+    subscription change gets a 401 so the client refreshes it and retries.
+    """
+    message = "A premium subscription is required."
+
+    def has_permission(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return False
+        claim = token_entitlement(request.auth, request.user)
+        if claim is None:
+            if request.auth is not None and request.auth.get(ENTITLEMENT_CLAIM):
+                raise AuthenticationFailed(
+                    "Subscription changed, refresh the access token.", code="entitlement_stale"
+                )
+            # Tokens issued before entitlement claims existed
+            raise AuthenticationFailed("Access token has no entitlement, refresh it.", code="entitlement_missing")
+        return is_premium(claim)
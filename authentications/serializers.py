@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from .models import CustomUser, OTP, UserProfile
 from django.contrib.auth import get_user_model, authenticate
-from payment.models import Subscription
+from payment.subscriptions import get_user_subscription
+from .tokens import token_entitlement
 
 User = get_user_model()
 
@@ -19,11 +20,17 @@ class CustomUserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'is_active', 'is_staff', 'is_superuser']
  
     def get_is_subscribed(self, obj):
-        try:
-            subscription = Subscription.objects.get(user=obj)
-            return subscription.is_active
-        except Subscription.DoesNotExist:
-            return False
+        # list_users annotates this so listing doesn't query Subscription per user
+        if hasattr(obj, 'has_active_subscription'):
+            return obj.has_active_subscription
+        # The caller's own record: the entitlement claim of the access token answers it
+        request = self.context.get('request')
+        if request is not None and request.user.pk == obj.pk:
+            claim = token_entitlement(request.auth, request.user)
+            if claim is not None:
+                return claim['active']
+        subscription = get_user_subscription(obj)
+        return subscription.is_active if subscription else False
 
     def get_user_profile(self, obj):
         try:
@@ -1,3 +1,79 @@
-from django.test import TestCase
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from payment.models import Subscription
+from .models import CustomUser, UserProfile
+from .permissions import HasPremiumEntitlement
+from .tokens import bump_entitlement_versions, token_entitlement, tokens_for_user
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ListUsersQueryCountTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(email='admin@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.created = 0
+
+    def create_users(self, count):
+        for _ in range(count):
+            self.created += 1
+            user = CustomUser.objects.create_user(email=f'user{self.created}@example.com', password='pass')
+            UserProfile.objects.create(user=user, first_name=f'User {self.created}')
+            Subscription.objects.create(user=user, is_active=self.created % 2 == 0)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/auth/users/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_query_count_does_not_grow_with_users(self):
+        self.create_users(3)
+        few_queries, _ = self.count_list_queries()
+
+        self.create_users(20)
+        many_queries, data = self.count_list_queries()
+
+        self.assertEqual(data['count'], 24)
+        self.assertEqual(few_queries, many_queries)
+
+    def test_subscription_and_profile_are_serialized(self):
+        self.create_users(2)
+        _, data = self.count_list_queries()
+
+        users = {user['email_address']: user for user in data['results']}
+        self.assertFalse(users['user1@example.com']['is_subscribed'])
+        self.assertTrue(users['user2@example.com']['is_subscribed'])
+        self.assertEqual(users['user2@example.com']['user_profile']['first_name'], 'User 2')
+        self.assertIsNone(users['admin@example.com']['user_profile'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EntitlementClaimTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='premium@example.com', password='pass')
+        Subscription.objects.create(user=self.user, status='premium', is_active=True)
+        self.user.refresh_from_db()  # creating the subscription bumped entitlement_version
+        self.token = AccessToken(str(tokens_for_user(self.user).access_token))
+
+    def check_permission(self):
+        request = SimpleNamespace(user=self.user, auth=self.token)
+        return HasPremiumEntitlement().has_permission(request, None)
+
+    def test_bumped_version_rejects_old_token(self):
+        self.assertTrue(self.check_permission())
+
+        bump_entitlement_versions([self.user.pk])
+        self.user.refresh_from_db()  # as the next request's authentication loads it
+
+        self.assertIsNone(token_entitlement(self.token, self.user))
+        with self.assertRaises(AuthenticationFailed) as raised:
+            self.check_permission()
+        self.assertEqual(raised.exception.get_codes(), 'entitlement_stale')
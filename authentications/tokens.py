@@ -0,0 +1,71 @@
+# authentications/tokens.py
+"""
+JWTs carrying an entitlement claim, so premium checks read the token instead of
+querying Subscription. The claim records the user's entitlement_version; a
+subscription change bumps the version, which invalidates older claims until
+the client refreshes its access token.
+"""
+from django.db.models import F
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CustomUser
+
+ENTITLEMENT_CLAIM = "ent"
+
+
+def build_entitlement(user):
+    """{"plan", "status", "active", "exp", "v"}; exp is the subscription end as a Unix timestamp."""
+    from payment.subscriptions import get_user_subscription  # payment.subscriptions imports this module
+
+    subscription = get_user_subscription(user)
+    if subscription is None:
+        return {"plan": None, "status": "free", "active": False, "exp": None, "v": user.entitlement_version}
+    return {
+        "plan": subscription.plan.name if subscription.plan else None,
+        "status": subscription.status,
+        "active": subscription.is_active,
+        "exp": int(subscription.end_date.timestamp()) if subscription.end_date else None,
+        "v": user.entitlement_version,
+    }
+
+
+def tokens_for_user(user):
+    """RefreshToken.for_user with the entitlement claim; the access token inherits it."""
+    refresh = RefreshToken.for_user(user)
+    refresh[ENTITLEMENT_CLAIM] = build_entitlement(user)
+    return refresh
+
+
+def access_token_from_refresh(refresh):
+    """A new access token for a refresh token, with the entitlement claim rebuilt."""
+    access = refresh.access_token
+    user = CustomUser.objects.get(pk=refresh["user_id"])
+    access[ENTITLEMENT_CLAIM] = build_entitlement(user)
+    return access
+
+
+def bump_entitlement_versions(user_ids):
+    """Invalidate the entitlement claims of these users, one UPDATE for all of them."""
+    CustomUser.objects.filter(pk__in=list(user_ids)).update(entitlement_version=F("entitlement_version") + 1)
+
+
+def token_entitlement(token, user):
+    """
+    The entitlement claim of a validated token if it is current, else None
+    (no claim, or issued before the user's last subscription change).
+    """
+    if token is None or not user.is_authenticated:
+        return None
+    claim = token.get(ENTITLEMENT_CLAIM)
+    # The authentication loaded the user row for this request, so its version is current
+    if not claim or claim.get("v") != user.entitlement_version:
+        return None
+    return claim
+
+
+def is_premium(claim):
+    """Whether a claim grants premium access right now."""
+    if not claim or claim["status"] != "premium" or not claim["active"]:
+        return False
+    return claim["exp"] is None or claim["exp"] > timezone.now().timestamp()
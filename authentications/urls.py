@@ -6,6 +6,7 @@ urlpatterns = [
     path('sign-in/', views.login),
     path('google-login/', views.google_login),
     path('users/', views.list_users),
+    path('users/export/', views.export_users),
     path('profile/', views.user_profile),
     path('otp/create/', views.create_otp),
     path('otp/verify/', views.verify_otp),
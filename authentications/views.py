@@ -5,7 +5,10 @@ from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, F, OuterRef
+from payment.models import Subscription
 from .models import OTP, UserProfile , CustomUser
+from .pagination import UserListPagination
 from .serializers import (
     CustomUserSerializer,
     CustomUserCreateSerializer,
@@ -14,12 +17,13 @@ from .serializers import (
     LoginSerializer
 )
 from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import access_token_from_refresh, tokens_for_user
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 import uuid
-from sara_main.utils import error_response
+from sara_main.utils import EXPORT_CHUNK_SIZE, error_response, streaming_export
 import random
 
 def generate_otp():
@@ -82,7 +86,7 @@ def login(request):
     serializer = LoginSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.validated_data
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         
         try:
             is_verified = user.is_verified
@@ -153,7 +157,7 @@ def google_login(request):
             profile.save()
 
     profile_serializer = UserProfileSerializer(profile)
-    refresh = RefreshToken.for_user(user)
+    refresh = tokens_for_user(user)
 
     return Response({
         "access_token": str(refresh.access_token),
@@ -168,9 +172,44 @@ def google_login(request):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def list_users(request):
-    users = User.objects.all()
-    serializer = CustomUserSerializer(users, many=True)
-    return Response(serializer.data)
+    # Profile and subscription state come from the same query as the users
+    users = User.objects.select_related('user_profile').annotate(
+        has_active_subscription=Exists(
+            Subscription.objects.filter(user=OuterRef('pk'), is_active=True)
+        )
+    ).order_by('id')
+    paginator = UserListPagination()
+    page = paginator.paginate_queryset(users, request)
+    serializer = CustomUserSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+USER_EXPORT_FIELDS = [
+    'id', 'email', 'role', 'is_verified', 'is_active', 'first_name', 'last_name',
+    'phone_number', 'company_name', 'joined_date', 'is_subscribed',
+]
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_users(request):
+    """
+    Stream every user as CSV (?output=csv) or NDJSON (default), reading the
+    table in chunks so memory stays flat however many users there are.
+    """
+    export_format = request.query_params.get('output', 'ndjson')
+    if export_format not in ('csv', 'ndjson'):
+        return error_response(code=400, details={"output": ["Must be csv or ndjson"]})
+
+    rows = User.objects.order_by('id').annotate(
+        first_name=F('user_profile__first_name'),
+        last_name=F('user_profile__last_name'),
+        phone_number=F('user_profile__phone_number'),
+        company_name=F('user_profile__company_name'),
+        joined_date=F('user_profile__joined_date'),
+        is_subscribed=Exists(Subscription.objects.filter(user=OuterRef('pk'), is_active=True)),
+    ).values(*USER_EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return streaming_export(rows, USER_EXPORT_FIELDS, export_format, 'users')
 
 
 
@@ -184,7 +223,7 @@ def user_profile(request):
 
     if request.method == 'GET':
         user = CustomUser.objects.get(id=request.user.id)
-        serializer = CustomUserSerializer(user)
+        serializer = CustomUserSerializer(user, context={'request': request})
         return Response(serializer.data)
 
     if request.method == 'PUT':
@@ -329,7 +368,7 @@ def verify_otp(request):
             otp_obj.delete()
             
             # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_for_user(user)
             
             # Ensure UserProfile exists
             try:
@@ -512,7 +551,7 @@ def get_access_token_by_refresh_token(request):
         )
     try:
         refresh = RefreshToken(refresh_token)
-        access_token = str(refresh.access_token)
+        access_token = str(access_token_from_refresh(refresh))
         return Response({"access_token": access_token}, status=status.HTTP_200_OK)
     except Exception as e:
         return error_response(
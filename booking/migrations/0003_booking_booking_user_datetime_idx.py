@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0002_booking_booking_end_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'booking_datetime'], name='booking_user_datetime_idx'),
+        ),
+    ]
@@ -22,5 +22,11 @@ class Booking(models.Model):
     booking_end_date = models.DateTimeField(blank=True, null=True)  # main date/time of booking
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Backs the per-user keyset pagination on (booking_datetime, id)
+            models.Index(fields=["user", "booking_datetime"], name="booking_user_datetime_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.get_booking_type_display()} @ {self.booking_datetime}"
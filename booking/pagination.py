@@ -0,0 +1,70 @@
+# bookings/pagination.py
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class BookingKeysetPagination(BasePagination):
+    """
+    Keyset pagination on (booking_datetime, id). The cursor is the last row of
+    the previous page, so every page is an index range scan no matter how deep.
+    """
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    default_limit = 20
+    max_limit = 100
+
+    def paginate_queryset(self, queryset, request, view=None, descending=False):
+        self.request = request
+        self.descending = descending
+        self.limit = self.get_limit(request)
+
+        ordering = ("-booking_datetime", "-id") if descending else ("booking_datetime", "id")
+        queryset = queryset.order_by(*ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            booking_datetime, pk = self.decode_cursor(cursor)
+            if descending:
+                after = Q(booking_datetime__lt=booking_datetime) | Q(booking_datetime=booking_datetime, id__lt=pk)
+            else:
+                after = Q(booking_datetime__gt=booking_datetime) | Q(booking_datetime=booking_datetime, id__gt=pk)
+            queryset = queryset.filter(after)
+
+        # One extra row tells whether there is a next page
+        rows = list(queryset[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        self.page = rows[:self.limit]
+        return self.page
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except ValueError:
+            raise ValidationError({self.limit_query_param: ["A valid integer is required."]})
+        return max(1, min(limit, self.max_limit))
+
+    def encode_cursor(self, booking):
+        raw = f"{booking.booking_datetime.isoformat()}|{booking.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            booking_datetime, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(booking_datetime), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise ValidationError({self.cursor_query_param: ["Invalid cursor."]})
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
@@ -0,0 +1,105 @@
+# bookings/reminders.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from notification.models import Notification
+
+# Used for any booking type, or policy key, missing from settings.BOOKING_REMINDER_POLICIES
+DEFAULT_REMINDER_POLICY = {
+    "lead_hours": 24,  # first reminder this long before the booking
+    "interval_hours": 5,  # gap between reminders
+    "count": 3,  # number of reminders
+}
+
+
+def get_reminder_policy(booking_type):
+    policies = getattr(settings, "BOOKING_REMINDER_POLICIES", {})
+    return {**DEFAULT_REMINDER_POLICY, **policies.get("default", {}), **policies.get(booking_type, {})}
+
+
+def compute_reminder_times(booking):
+    """Reminder times for a booking under its type's policy, never after the booking itself."""
+    policy = get_reminder_policy(booking.booking_type)
+    interval = timedelta(hours=policy["interval_hours"])
+    notify_time = booking.booking_datetime - timedelta(hours=policy["lead_hours"])
+
+    times = []
+    for i in range(policy["count"]):
+        # Prevent reminder from being scheduled after the booking time
+        if notify_time < booking.booking_datetime:
+            times.append(notify_time)
+        notify_time += interval  # next reminder after interval
+    return times
+
+
+def reminder_message(booking):
+    return f"Reminder: Your {booking.get_booking_type_display()} booking is coming up at {booking.booking_datetime.date()}."
+
+
+def build_reminders(booking):
+    """
+    Unsaved Notification rows for the booking's reminders that are still ahead.
+    Times already past are left out, or the dispatcher would send them all at once.
+    """
+    message = reminder_message(booking)
+    now = timezone.now()
+    return [
+        Notification(user_id=booking.user_id, booking=booking, message=message, notify_at=notify_at, sent=False)
+        for notify_at in compute_reminder_times(booking)
+        if notify_at > now
+    ]
+
+
+def create_booking_reminders(bookings):
+    """Write the reminders for all given bookings with one bulk_create."""
+    reminders = [reminder for booking in bookings for reminder in build_reminders(booking)]
+    return Notification.objects.bulk_create(reminders)
+
+
+def sync_booking_reminders(booking):
+    """
+    Bring the booking's reminders in line with its current schedule, inserting,
+    updating or deleting only the pending rows that changed.
+    Reminders whose time is unchanged are kept, sent or not, and new reminder
+    times that are already in the past are not scheduled.
+    Returns {"created": n, "updated": n, "deleted": n}.
+    """
+    wanted = build_reminders(booking)
+    existing = list(Notification.objects.filter(booking=booking).order_by("notify_at", "pk"))
+    message = reminder_message(booking)
+
+    existing_times = {reminder.notify_at for reminder in existing}
+    # Past times included, so an existing row at one of them is kept rather than treated as stale
+    wanted_times = set(compute_reminder_times(booking))
+
+    to_update = []
+    # Same time: keep the row, only the message may have changed (e.g. booking type)
+    for reminder in existing:
+        if not reminder.sent and reminder.notify_at in wanted_times and reminder.message != message:
+            reminder.message = message
+            to_update.append(reminder)
+
+    # Pending rows no longer wanted are moved to new times before any insert or delete
+    stale = [reminder for reminder in existing if not reminder.sent and reminder.notify_at not in wanted_times]
+    missing = [reminder for reminder in wanted if reminder.notify_at not in existing_times]
+    for reminder, replacement in zip(stale, missing):
+        reminder.notify_at = replacement.notify_at
+        reminder.message = replacement.message
+        to_update.append(reminder)
+
+    to_create = missing[len(stale):]
+    to_delete = [reminder.pk for reminder in stale[len(missing):]]
+
+    if to_update:
+        Notification.objects.bulk_update(to_update, ["notify_at", "message"])
+    if to_create:
+        Notification.objects.bulk_create(to_create)
+    if to_delete:
+        Notification.objects.filter(pk__in=to_delete).delete()
+    return {"created": len(to_create), "updated": len(to_update), "deleted": len(to_delete)}
+
+
+def cancel_booking_reminders(booking):
+    """Delete every pending reminder of the booking in one statement."""
+    return Notification.objects.filter(booking=booking, sent=False).delete()[0]
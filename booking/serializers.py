@@ -4,6 +4,15 @@ from .models import Booking
 
 
 class BookingSerializer(serializers.ModelSerializer):
+    """Pass `fields=[...]` to serialize only a subset of the fields."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
     class Meta:
         model = Booking
         fields = ['id', 'user', 'booking_type',
@@ -7,5 +7,7 @@ urlpatterns = [
   
     path("list/", views.booking_list_create),
     path("create/", views.booking_list_create),
+    path("bulk-import/", views.booking_bulk_import),
+    path("<int:pk>/", views.booking_detail),
 
 ]
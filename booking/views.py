@@ -3,11 +3,15 @@ from rest_framework.decorators import api_view , permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from .models import Booking
+from .pagination import BookingKeysetPagination
 from .serializers import BookingSerializer
-from notification.models import Notification
+from .reminders import cancel_booking_reminders, create_booking_reminders, sync_booking_reminders
+from chatbot.user_context import invalidate_user_context
 # List all bookings or create a new one
-from datetime import timedelta
 
 
 @api_view(['GET', 'POST'])
@@ -15,42 +19,87 @@ from datetime import timedelta
 def booking_list_create(request):
     if request.method == 'GET':
         # Show only the logged-in user's bookings (better security)
-        bookings = Booking.objects.filter(user=request.user).order_by("booking_datetime")
-        serializer = BookingSerializer(bookings, many=True)
-        return Response(serializer.data)
+        bookings = Booking.objects.filter(user=request.user)
+
+        # ?when=upcoming|past, upcoming oldest first and past newest first
+        when = request.query_params.get('when')
+        if when not in (None, 'upcoming', 'past'):
+            return Response({'error': 'when must be "upcoming" or "past"'}, status=status.HTTP_400_BAD_REQUEST)
+        if when == 'upcoming':
+            bookings = bookings.filter(booking_datetime__gte=timezone.now())
+        elif when == 'past':
+            bookings = bookings.filter(booking_datetime__lt=timezone.now())
+
+        booking_type = request.query_params.get('booking_type')
+        if booking_type:
+            bookings = bookings.filter(booking_type=booking_type)
+
+        # ?fields=id,booking_type,... sparse fieldset
+        fields = None
+        if request.query_params.get('fields'):
+            fields = [name.strip() for name in request.query_params['fields'].split(',') if name.strip()]
+            unknown = set(fields) - set(BookingSerializer.Meta.fields)
+            if unknown:
+                return Response({'error': f"Unknown fields: {', '.join(sorted(unknown))}"}, status=status.HTTP_400_BAD_REQUEST)
+            # The pagination cursor needs id and booking_datetime
+            bookings = bookings.only(*{*fields, 'id', 'booking_datetime'})
+
+        paginator = BookingKeysetPagination()
+        page = paginator.paginate_queryset(bookings, request, descending=(when == 'past'))
+        serializer = BookingSerializer(page, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
 
     elif request.method == 'POST':
         serializer = BookingSerializer(data=request.data)
         if serializer.is_valid():
-            # ✅ Save booking with the current user
-            booking = serializer.save(user=request.user)
-
-            # --- Create multiple reminders ---
-            num_reminders = 3  # number of reminders
-            interval = timedelta(hours=5)  # interval between reminders
-            notify_time = booking.booking_datetime - timedelta(days=1)  # start 1 day before
-
-            for i in range(num_reminders):
-                # Prevent reminder from being scheduled after the booking time
-                if notify_time < booking.booking_datetime:
-                    Notification.objects.create(
-                        user=booking.user,
-                        message=f"Reminder: Your {booking.get_booking_type_display()} booking is coming up at {booking.booking_datetime.date()}.",
-                        notify_at=notify_time,
-                        sent=False
-                    )
-                notify_time += interval  # next reminder after interval
+            with transaction.atomic():
+                # ✅ Save booking with the current user
+                booking = serializer.save(user=request.user)
+                # --- Create multiple reminders ---
+                create_booking_reminders([booking])
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def booking_bulk_import(request):
+    """
+    Create many bookings for the current user at once.
+    Accepts a list of bookings, or {"bookings": [...]}; all or nothing.
+    """
+    data = request.data.get("bookings") if isinstance(request.data, dict) else request.data
+    if not isinstance(data, list) or not data:
+        return Response({'error': 'A non-empty list of bookings is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(data) > settings.BOOKING_IMPORT_MAX:
+        return Response(
+            {'error': f'At most {settings.BOOKING_IMPORT_MAX} bookings can be imported at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    serializer = BookingSerializer(data=data, many=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        bookings = Booking.objects.bulk_create(
+            [Booking(user=request.user, **attrs) for attrs in serializer.validated_data]
+        )
+        create_booking_reminders(bookings)
+    # bulk_create sends no post_save, so the chatbot context is dropped here
+    invalidate_user_context(request.user.pk)
+
+    return Response(BookingSerializer(bookings, many=True).data, status=status.HTTP_201_CREATED)
 # Retrieve, update, or delete a booking
 
 
 @api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
 def booking_detail(request, pk):
     try:
-        booking = Booking.objects.get(pk=pk)
+        booking = Booking.objects.get(pk=pk, user=request.user)
     except Booking.DoesNotExist:
         return Response({'error': 'Booking not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -61,10 +110,15 @@ def booking_detail(request, pk):
     elif request.method == 'PUT':
         serializer = BookingSerializer(booking, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                booking = serializer.save()
+                # Only reminders whose schedule changed are touched
+                sync_booking_reminders(booking)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == 'DELETE':
-        booking.delete()
+        with transaction.atomic():
+            cancel_booking_reminders(booking)
+            booking.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
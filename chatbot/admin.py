@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import Conversation, ChatMessage
 
-# Register your models here.
+
+class ChatMessageInline(admin.TabularInline):
+    model = ChatMessage
+    extra = 0
+
+
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ('public_id', 'user', 'created_at', 'updated_at')
+    search_fields = ('user__email',)
+    inlines = [ChatMessageInline]
+
+
+admin.site.register(Conversation, ConversationAdmin)
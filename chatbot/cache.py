@@ -0,0 +1,202 @@
+# chatbot/cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+try:
+    import numpy as np
+except ImportError:  # optional, only the semantic tier needs it
+    np = None
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+class ResponseCache:
+    """
+    In-process cache of chatbot replies keyed on the system prompt plus the last
+    user message, with TTL and LRU eviction.
+
+    Exact tier: hash of the normalized texts.
+    Semantic tier (optional, needs NumPy): cosine similarity between the
+    embedding of the question and those of cached questions under the same
+    system prompt, kept in a preallocated matrix with one row per entry.
+    """
+
+    def __init__(self, max_entries, ttl, similarity_threshold):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (reply, expires_at, system_key, row)
+        self._vectors = None  # created on the first embedding, shape (max_entries, dim)
+        self._row_system = [None] * max_entries
+        self._row_keys = [None] * max_entries
+        self._free_rows = list(range(max_entries))
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def system_key(system_prompt):
+        return hashlib.sha256(normalize(system_prompt).encode()).hexdigest()
+
+    @classmethod
+    def key(cls, system_prompt, user_message):
+        return hashlib.sha256(
+            f"{cls.system_key(system_prompt)}\x00{normalize(user_message)}".encode()
+        ).hexdigest()
+
+    @property
+    def semantic_enabled(self):
+        return np is not None and settings.CHATBOT_SEMANTIC_CACHE
+
+    def get(self, system_prompt, user_message, embedding=None):
+        """Return (reply, tier) on a hit, tier being "exact" or "semantic", else (None, None)."""
+        reply = self.get_exact(system_prompt, user_message)
+        if reply is not None:
+            return reply, "exact"
+        reply = self.get_semantic(system_prompt, embedding)
+        return (reply, "semantic") if reply is not None else (None, None)
+
+    def get_exact(self, system_prompt, user_message):
+        """The reply from the exact tier or None. Misses aren't counted, get_semantic() finishes the lookup."""
+        key = self.key(system_prompt, user_message)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry[0]
+            if entry:
+                self._remove(key)
+            return None
+
+    def get_semantic(self, system_prompt, embedding):
+        """The reply from the semantic tier or None, counted as a miss."""
+        with self._lock:
+            if embedding is not None and self.semantic_enabled and self._vectors is not None:
+                match = self._nearest(self.system_key(system_prompt), embedding, time.monotonic())
+                if match:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    return self._entries[match][0]
+
+            self.misses += 1
+            return None
+
+    def set(self, system_prompt, user_message, reply, embedding=None):
+        key = self.key(system_prompt, user_message)
+        system_key = self.system_key(system_prompt)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))  # least recently used
+
+            row = None
+            if embedding is not None and self.semantic_enabled:
+                row = self._free_rows.pop()
+                vector = np.asarray(embedding, dtype=np.float32)
+                if self._vectors is None:
+                    self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._vectors[row] = vector / (np.linalg.norm(vector) or 1)
+                self._row_system[row] = system_key
+                self._row_keys[row] = key
+
+            self._entries[key] = (reply, time.monotonic() + self.ttl, system_key, row)
+
+    def _remove(self, key):
+        _, _, _, row = self._entries.pop(key)
+        if row is not None:
+            self._vectors[row] = 0
+            self._row_system[row] = None
+            self._row_keys[row] = None
+            self._free_rows.append(row)
+
+    def _nearest(self, system_key, embedding, now):
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        similarities = self._vectors @ query
+        # Only questions asked under the same system prompt are candidates
+        candidates = np.fromiter((s == system_key for s in self._row_system), dtype=bool, count=self.max_entries)
+        similarities[~candidates] = -1
+
+        row = int(np.argmax(similarities))
+        if similarities[row] < self.similarity_threshold:
+            return None
+        key = self._row_keys[row]
+        if self._entries[key][1] <= now:
+            self._remove(key)
+            return None
+        return key
+
+    def stats(self):
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0,
+        }
+
+
+response_cache = ResponseCache(
+    max_entries=settings.CHATBOT_CACHE_MAX_ENTRIES,
+    ttl=settings.CHATBOT_CACHE_TTL,
+    similarity_threshold=settings.CHATBOT_SEMANTIC_THRESHOLD,
+)
+
+
+def embedding_request(text):
+    return {"model": settings.CHATBOT_EMBEDDING_MODEL, "input": normalize(text)}
+
+
+def embed(client, text):
+    """Embedding for the semantic tier, or None when it is disabled or unavailable."""
+    if not response_cache.semantic_enabled:
+        return None
+    try:
+        return client.embeddings.create(**embedding_request(text)).data[0].embedding
+    except Exception as e:
+        # The exact tier still works without it
+        print("Chatbot cache embedding failed:", e)
+        return None
+
+
+async def aembed(async_client, text):
+    if not response_cache.semantic_enabled:
+        return None
+    try:
+        response = await async_client.embeddings.create(**embedding_request(text))
+        return response.data[0].embedding
+    except Exception as e:
+        print("Chatbot cache embedding failed:", e)
+        return None
+
+
+def lookup(client, system_prompt, user_message):
+    """
+    (reply, tier, embedding). The exact tier is checked first and the question
+    is only embedded on an exact miss; the embedding is returned for set().
+    """
+    reply = response_cache.get_exact(system_prompt, user_message)
+    if reply is not None:
+        return reply, "exact", None
+    embedding = embed(client, user_message)
+    reply = response_cache.get_semantic(system_prompt, embedding)
+    return reply, "semantic" if reply is not None else None, embedding
+
+
+async def alookup(async_client, system_prompt, user_message):
+    reply = response_cache.get_exact(system_prompt, user_message)
+    if reply is not None:
+        return reply, "exact", None
+    embedding = await aembed(async_client, user_message)
+    reply = response_cache.get_semantic(system_prompt, embedding)
+    return reply, "semantic" if reply is not None else None, embedding
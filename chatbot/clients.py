@@ -0,0 +1,44 @@
+# chatbot/clients.py
+import asyncio
+import os
+import weakref
+
+import httpx
+import openai
+from django.conf import settings
+
+_client = None
+# AsyncClient connections belong to the event loop that opened them, so one
+# client per loop: a single shared client per process under ASGI.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=settings.CHATBOT_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.CHATBOT_MAX_CONNECTIONS,
+    )
+
+
+def get_client():
+    """Process-wide sync OpenAI client with a bounded connection pool."""
+    global _client
+    if _client is None:
+        _client = openai.Client(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            http_client=openai.DefaultHttpxClient(limits=_limits()),
+        )
+    return _client
+
+
+def get_async_client():
+    """Shared AsyncClient for the running event loop, with a bounded connection pool."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = openai.AsyncClient(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            http_client=openai.DefaultAsyncHttpxClient(limits=_limits()),
+        )
+        _async_clients[loop] = client
+    return client
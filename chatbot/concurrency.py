@@ -0,0 +1,89 @@
+# chatbot/concurrency.py
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+
+
+class QueueFull(Exception):
+    """Too many chats are already waiting for a slot."""
+
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight OpenAI calls per process; extra chats wait in a bounded queue.
+    Counters are per process and exposed through stats().
+    """
+
+    def __init__(self, limit, max_queue, queue_timeout):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphores = weakref.WeakKeyDictionary()  # one per event loop
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self):
+        semaphore = self._semaphore()
+        if not semaphore.locked():
+            await semaphore.acquire()
+        else:
+            # All slots taken: wait in the queue, if there is room in it
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull()
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            # acquire() runs in this task under asyncio.timeout rather than in a
+            # wait_for task, whose permit is lost when the timeout and the acquire race
+            acquired = False
+            try:
+                async with asyncio.timeout(self.queue_timeout):
+                    await semaphore.acquire()
+                    acquired = True
+            except BaseException as e:
+                if acquired:
+                    semaphore.release()
+                if isinstance(e, TimeoutError):
+                    self.rejected += 1
+                    raise QueueFull() from None
+                raise
+            finally:
+                self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            semaphore.release()
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "peak_queue_depth": self.peak_waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+chat_limiter = ConcurrencyLimiter(
+    limit=settings.CHATBOT_MAX_CONCURRENCY,
+    max_queue=settings.CHATBOT_MAX_QUEUE,
+    queue_timeout=settings.CHATBOT_QUEUE_TIMEOUT,
+)
@@ -0,0 +1,131 @@
+# chatbot/context.py
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .concurrency import chat_limiter
+from .models import Conversation
+
+try:
+    import tiktoken
+except ImportError:  # optional, counts fall back to a character estimate
+    tiktoken = None
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# When history overflows, trim it to this share of the budget so the summary
+# is refreshed every few turns rather than on every message
+TRIM_TARGET_RATIO = 0.5
+
+_encoding = None
+
+
+def count_tokens(text):
+    global _encoding
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o family
+    return len(_encoding.encode(text))
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def split_history(history, budget):
+    """
+    Split history (oldest first) into (overflow, window): window is the newest
+    turns that fit in `budget` tokens. If everything fits, overflow is empty;
+    otherwise the window is trimmed to TRIM_TARGET_RATIO of the budget.
+    """
+    total = sum(message_tokens(message) for message in history)
+    if total <= budget:
+        return [], history
+
+    target = budget * TRIM_TARGET_RATIO
+    used = 0
+    start = len(history)
+    while start > 0 and used + message_tokens(history[start - 1]) <= target:
+        start -= 1
+        used += message_tokens(history[start])
+    return history[:start], history[start:]
+
+
+def summary_request(summary, turns):
+    """Completion arguments that fold `turns` into the previous summary."""
+    transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+    return {
+        "model": settings.CHATBOT_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": "Update the running summary of a conversation with the new turns. "
+                           "Keep facts, names, dates and open questions. Reply with the summary only.",
+            },
+            {"role": "user", "content": f"Summary so far:\n{summary or '(empty)'}\n\nNew turns:\n{transcript}"},
+        ],
+        "max_tokens": settings.CHATBOT_SUMMARY_MAX_TOKENS,
+        "temperature": 0,
+    }
+
+
+def summarize(client, summary, turns):
+    response = client.chat.completions.create(**summary_request(summary, turns))
+    return response.choices[0].message.content.strip()
+
+
+async def asummarize(async_client, summary, turns):
+    # Counts against the same per-process cap as the chat completions
+    async with chat_limiter.slot():
+        response = await async_client.chat.completions.create(**summary_request(summary, turns))
+    return response.choices[0].message.content.strip()
+
+
+def save_summary(conversation, summary, overflow):
+    conversation.summary = summary
+    conversation.summary_upto = overflow[-1]["id"]
+    Conversation.objects.filter(pk=conversation.pk).update(
+        summary=conversation.summary, summary_upto=conversation.summary_upto
+    )
+
+
+def history_budget(user_turn):
+    return settings.CHATBOT_CONTEXT_TOKEN_BUDGET - message_tokens(user_turn)
+
+
+def assemble_prompt(conversation, system_prompt, window, overflow, user_turn):
+    if conversation.summary:
+        system_prompt = f"{system_prompt}\n\nSummary of the earlier conversation:\n{conversation.summary}"
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        *({"role": turn["role"], "content": turn["content"]} for turn in window),
+        user_turn,
+    ]
+    metrics = {
+        "estimated_prompt_tokens": sum(message_tokens(message) for message in messages),
+        "history_turns": len(window),
+        "summarized_turns": len(overflow),
+    }
+    return messages, metrics
+
+
+def build_prompt(client, conversation, system_prompt, history, user_turn):
+    """
+    Assemble the messages for the next completion within
+    CHATBOT_CONTEXT_TOKEN_BUDGET. Turns that no longer fit are folded into the
+    conversation's rolling summary, which is saved so each turn is summarized once.
+    Returns (messages, metrics).
+    """
+    overflow, window = split_history(history, history_budget(user_turn))
+    if overflow:
+        save_summary(conversation, summarize(client, conversation.summary, overflow), overflow)
+    return assemble_prompt(conversation, system_prompt, window, overflow, user_turn)
+
+
+async def abuild_prompt(async_client, conversation, system_prompt, history, user_turn):
+    """build_prompt for async views; the summary call doesn't block a thread."""
+    overflow, window = split_history(history, history_budget(user_turn))
+    if overflow:
+        summary = await asummarize(async_client, conversation.summary, overflow)
+        await sync_to_async(save_summary)(conversation, summary, overflow)
+    return assemble_prompt(conversation, system_prompt, window, overflow, user_turn)
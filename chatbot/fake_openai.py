@@ -0,0 +1,110 @@
+# chatbot/fake_openai.py
+"""
+A local stand-in for the OpenAI chat completions API, for benchmarks and tests.
+Point a client at it with base_url=<url returned by start_fake_openai_server>.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path.endswith("/chat/completions"):
+            if body.get("stream"):
+                self.stream_completion(body)
+            else:
+                self.completion(body)
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def usage(self, body):
+        prompt_tokens = sum(len(message.get("content", "")) // 4 + 1 for message in body.get("messages", []))
+        completion_tokens = len(self.server.reply_tokens)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def completion(self, body):
+        # A blocking call returns only once the whole reply is "generated"
+        time.sleep(self.server.first_token_delay + self.server.token_delay * len(self.server.reply_tokens))
+        self.send_json(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(self.server.reply_tokens)},
+                "finish_reason": "stop",
+            }],
+            "usage": self.usage(body),
+        })
+
+    def stream_completion(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(delta=None, finish_reason=None, usage=None):
+            payload = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [] if usage else [{"index": 0, "delta": delta or {}, "finish_reason": finish_reason}],
+            }
+            if usage:
+                payload["usage"] = usage
+            self.write_chunk(f"data: {json.dumps(payload)}\n\n")
+
+        time.sleep(self.server.first_token_delay)
+        chunk({"role": "assistant", "content": ""})
+        for token in self.server.reply_tokens:
+            chunk({"content": token})
+            time.sleep(self.server.token_delay)
+        chunk(finish_reason="stop")
+        if body.get("stream_options", {}).get("include_usage"):
+            chunk(usage=self.usage(body))
+        self.write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_fake_openai_server(reply="This is a reply from the fake OpenAI server.", first_token_delay=0.3,
+                             token_delay=0.02, port=0):
+    """
+    Serve fake completions on 127.0.0.1 in a daemon thread.
+    Returns (server, base_url); call server.shutdown() when done.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.reply_tokens = [word + " " for word in reply.split()]
+    server.first_token_delay = first_token_delay
+    server.token_delay = token_delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
@@ -0,0 +1,50 @@
+# chatbot/management/commands/benchmark_chat_stream.py
+import asyncio
+import time
+
+import openai
+from django.core.management.base import BaseCommand
+from chatbot.fake_openai import start_fake_openai_server
+from chatbot.streaming import stream_completion
+
+
+class Command(BaseCommand):
+    help = "Compare time-to-first-token of streamed vs blocking chat replies against a local fake OpenAI server."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5)
+        parser.add_argument("--first-token-delay", type=float, default=0.3, help="Seconds before the first token.")
+        parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between tokens.")
+
+    def handle(self, *args, **options):
+        server, base_url = start_fake_openai_server(
+            first_token_delay=options["first_token_delay"], token_delay=options["token_delay"]
+        )
+        try:
+            blocking, streamed = asyncio.run(self.run(base_url, options["requests"]))
+        finally:
+            server.shutdown()
+
+        self.stdout.write(f"blocking: first text after {sum(blocking) / len(blocking) * 1000:.0f}ms on average")
+        self.stdout.write(
+            f"streamed: first token after {sum(s['time_to_first_token'] for s in streamed) / len(streamed) * 1000:.0f}ms, "
+            f"complete after {sum(s['total_time'] for s in streamed) / len(streamed) * 1000:.0f}ms on average"
+        )
+
+    async def run(self, base_url, requests):
+        client = openai.AsyncClient(api_key="fake", base_url=base_url)
+        messages = [{"role": "user", "content": "When is my booking?"}]
+        blocking, streamed = [], []
+
+        for _ in range(requests):
+            started = time.monotonic()
+            await client.chat.completions.create(model="fake", messages=messages)
+            blocking.append(time.monotonic() - started)
+
+            metrics = {}
+            async for _delta in stream_completion(client, messages, metrics):
+                pass
+            streamed.append(metrics)
+
+        await client.close()
+        return blocking, streamed
@@ -1,3 +1,44 @@
+import uuid
+
 from django.db import models
+from django.conf import settings
+
+
+class Conversation(models.Model):
+    public_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)  # id handed to clients
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="conversations", blank=True, null=True)
+    # Rolling summary of turns that no longer fit the prompt budget, up to and including summary_upto
+    summary = models.TextField(blank=True, default="")
+    summary_upto = models.BigIntegerField(blank=True, null=True)  # ChatMessage id
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-updated_at"], name="chatbot_conv_user_recent_idx"),
+        ]
+
+    def __str__(self):
+        return f"Conversation {self.public_id}"
+
+
+class ChatMessage(models.Model):
+    ROLE_CHOICES = [
+        ("user", "User"),
+        ("assistant", "Assistant"),
+    ]
+
+    # Append-only: rows are written once per turn and read back in id order
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="messages")
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["conversation", "id"], name="chatbot_msg_conv_idx"),
+        ]
 
-# Create your models here.
+    def __str__(self):
+        return f"{self.role}: {self.content[:50]}"
@@ -0,0 +1,141 @@
+# chatbot/ratelimit.py
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from authentications.tokens import is_premium, token_entitlement
+
+PLAN_TIER_KEY = "chatbot:plan_tier:{}"
+
+
+class RateLimited(Exception):
+    """The caller's token bucket is empty."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Rate limit exceeded, retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class LocalTokenBucketBackend:
+    """
+    Token buckets in process memory. Fast, but each process enforces the limit
+    on its own, so the effective limit grows with the number of workers.
+    """
+
+    # Buckets idle long enough to be full again are dropped past this many keys
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> (tokens, updated_at)
+
+    def take(self, key, rate, burst):
+        """Take one token; returns 0 when allowed, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                if len(self._buckets) > self.MAX_KEYS:
+                    self._prune(now, rate, burst)
+                return 0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def _prune(self, now, rate, burst):
+        refill = burst / rate
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < refill
+        }
+
+
+class CacheTokenBucketBackend:
+    """
+    Token buckets in the Django cache, shared by every process using the same
+    cache (e.g. Redis). Stores one timestamp per key (GCRA): the time at which
+    the bucket is full again. The read and write are not atomic, so concurrent
+    requests of one caller can slip a few extra calls through.
+    """
+
+    def take(self, key, rate, burst):
+        now = time.time()
+        interval = 1 / rate
+        cache_key = f"chatbot:ratelimit:{key}"
+        full_at = max(cache.get(cache_key, now), now)
+        # Allowed while the bucket still has room for one more call
+        if full_at + interval - now > burst * interval:
+            return full_at + interval - now - burst * interval
+        full_at += interval
+        cache.set(cache_key, full_at, timeout=math.ceil(full_at - now) + 1)
+        return 0
+
+
+def plan_tier(user):
+    """
+    "premium" for an active, unexpired premium subscription, else "free".
+    Cached per user; subscription writes drop it (payment.subscriptions).
+    """
+    key = PLAN_TIER_KEY.format(user.pk)
+    tier = cache.get(key)
+    if tier is None:
+        from payment.subscriptions import get_user_subscription  # payment.subscriptions imports this module
+
+        subscription = get_user_subscription(user)
+        premium = (
+            subscription is not None and subscription.status == "premium" and subscription.is_active
+            and (subscription.end_date is None or subscription.end_date >= timezone.now())
+        )
+        tier = "premium" if premium else "free"
+        cache.set(key, tier, settings.CHATBOT_PLAN_TIER_TTL)
+    return tier
+
+
+def client_ip(request):
+    # REMOTE_ADDR only; X-Forwarded-For is set by the client unless a proxy rewrites it
+    return request.META.get("REMOTE_ADDR", "unknown")
+
+
+class ChatRateLimiter:
+    """
+    Per-caller token bucket in front of the chat views. Authenticated users are
+    keyed by id with the limits of their plan tier, anonymous callers by IP.
+    """
+
+    def __init__(self, backend, limits):
+        self.backend = backend
+        self.limits = limits
+        self.allowed = 0
+        self.limited = 0
+
+    def identify(self, user, request):
+        if user.is_authenticated:
+            # A current entitlement claim in the access token saves the tier lookup
+            claim = token_entitlement(getattr(request, "auth", None), user)
+            tier = ("premium" if is_premium(claim) else "free") if claim else plan_tier(user)
+            return f"user:{user.pk}", tier
+        return f"ip:{client_ip(request)}", "anonymous"
+
+    def check(self, user, request):
+        """Raise RateLimited if the caller has no tokens left."""
+        key, tier = self.identify(user, request)
+        limit = self.limits[tier]
+        wait = self.backend.take(key, limit["per_minute"] / 60, limit["burst"])
+        if wait:
+            self.limited += 1
+            raise RateLimited(math.ceil(wait))
+        self.allowed += 1
+
+    def stats(self):
+        return {"allowed": self.allowed, "limited": self.limited}
+
+
+rate_limiter = ChatRateLimiter(
+    backend=import_string(settings.CHATBOT_RATE_LIMIT_BACKEND)(),
+    limits=settings.CHATBOT_RATE_LIMITS,
+)
@@ -0,0 +1,13 @@
+# chatbot/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from booking.models import Booking
+from .user_context import invalidate_user_context
+
+
+# Subscription writes drop the context through payment.subscriptions.invalidate_subscription_caches
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def drop_user_context(sender, instance, **kwargs):
+    invalidate_user_context(instance.user_id)
@@ -0,0 +1,61 @@
+# chatbot/store.py
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from .models import Conversation, ChatMessage
+
+SESSION_KEY = "conversation_id"
+
+
+def _find_conversation(public_id, user):
+    try:
+        return Conversation.objects.filter(public_id=public_id, user=user).first()
+    except ValidationError:
+        # Not a valid UUID
+        return None
+
+
+def get_conversation(request, conversation_id=None):
+    """
+    Resolve the conversation for this request: the id sent by the client, else the
+    one remembered in the session, else the user's latest, else a new one.
+    Returns None if an explicit id doesn't belong to the caller.
+    """
+    user = request.user if request.user.is_authenticated else None
+
+    if conversation_id:
+        return _find_conversation(conversation_id, user)
+
+    session_id = request.session.get(SESSION_KEY)
+    if session_id:
+        conversation = _find_conversation(session_id, user)
+        if conversation:
+            return conversation
+
+    if user:
+        conversation = Conversation.objects.filter(user=user).order_by("-updated_at").first()
+        if conversation:
+            return conversation
+
+    conversation = Conversation.objects.create(user=user)
+    # Only the id lives in the session, so it is written once per conversation
+    request.session[SESSION_KEY] = str(conversation.public_id)
+    return conversation
+
+
+def load_history(conversation):
+    """
+    Turns not yet folded into the conversation summary, oldest first, in one
+    indexed query.
+    """
+    messages = conversation.messages.order_by("id")
+    if conversation.summary_upto:
+        messages = messages.filter(id__gt=conversation.summary_upto)
+    return list(messages.values("id", "role", "content"))
+
+
+def append_turns(conversation, turns):
+    """Insert only the new turns, e.g. [{"role": "user", ...}, {"role": "assistant", ...}]."""
+    ChatMessage.objects.bulk_create(
+        [ChatMessage(conversation=conversation, role=turn["role"], content=turn["content"]) for turn in turns]
+    )
+    Conversation.objects.filter(pk=conversation.pk).update(updated_at=timezone.now())
@@ -0,0 +1,38 @@
+# chatbot/streaming.py
+import json
+import time
+
+from django.conf import settings
+
+
+def sse(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_completion(async_client, messages, metrics):
+    """
+    Yield reply text deltas from a streamed chat completion. Fills `metrics` with
+    time_to_first_token (seconds) and the token usage reported by the API.
+    """
+    started = time.monotonic()
+    stream = await async_client.chat.completions.create(
+        model=settings.CHATBOT_MODEL,
+        messages=messages,
+        max_tokens=150,
+        temperature=0.7,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    async for chunk in stream:
+        if chunk.usage:
+            metrics["prompt_tokens"] = chunk.usage.prompt_tokens
+            metrics["completion_tokens"] = chunk.usage.completion_tokens
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if "time_to_first_token" not in metrics:
+                metrics["time_to_first_token"] = time.monotonic() - started
+            yield delta
+    metrics["total_time"] = time.monotonic() - started
@@ -1,3 +1,44 @@
+from unittest import mock
+
+import openai
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .cache import ResponseCache
+from .fake_openai import start_fake_openai_server
+
+
+class ReplyCacheTests(TestCase):
+    def setUp(self):
+        self.server, base_url = start_fake_openai_server(first_token_delay=0, token_delay=0)
+        client = openai.Client(api_key='fake', base_url=base_url)
+        fresh_cache = ResponseCache(max_entries=100, ttl=3600, similarity_threshold=0.92)
+        for patcher in (
+            mock.patch('chatbot.views.get_client', return_value=client),
+            mock.patch('chatbot.views.response_cache', fresh_cache),
+            mock.patch('chatbot.cache.response_cache', fresh_cache),
+            mock.patch('chatbot.views.rate_limiter.check'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def ask(self, client, message):
+        response = client.post('/api/chatbot/ai-chat/', {'message': message}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['usage']['cache']
+
+    def test_follow_up_replies_are_not_shared_across_conversations(self):
+        first, second = APIClient(), APIClient()
+
+        self.assertEqual(self.ask(first, 'My card number is 4242, remember it'), 'miss')
+        # Has history, so it is neither answered from nor stored in the cache
+        self.assertEqual(self.ask(first, 'What did I just tell you?'), 'bypass')
+
+        self.assertEqual(self.ask(second, 'what did I just tell you?'), 'miss')
 
-# Create your tests here.
+    def test_first_questions_are_cached(self):
+        self.assertEqual(self.ask(APIClient(), 'What are your opening hours?'), 'miss')
+        self.assertEqual(self.ask(APIClient(), 'what are your opening hours?'), 'exact')
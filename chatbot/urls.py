@@ -6,5 +6,8 @@ from . import views
 urlpatterns = [
 
     path("ai-chat/", views.chatbot_response),
+    path("ai-chat/async/", views.chatbot_response_async),
+    path("ai-chat/stream/", views.chatbot_stream),
+    path("ai-chat/metrics/", views.chatbot_metrics),
 
 ]
@@ -0,0 +1,83 @@
+# chatbot/user_context.py
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from booking.models import Booking
+
+CACHE_KEY = "chatbot:user_context:{}"
+
+
+def cache_key(user_id):
+    return CACHE_KEY.format(user_id)
+
+
+def build_user_context(user):
+    """
+    Compact text of the user's upcoming bookings and subscription for the system
+    prompt. Returns (text, seconds until the soonest booking starts or None).
+    """
+    now = timezone.now()
+    bookings = list(
+        Booking.objects.filter(user=user, booking_datetime__gte=now)
+        .order_by("booking_datetime", "id")
+        .only("booking_type", "location", "booking_datetime", "booking_end_date")[:settings.CHATBOT_CONTEXT_BOOKINGS]
+    )
+    from payment.subscriptions import get_user_subscription  # payment.subscriptions imports this module
+
+    subscription = get_user_subscription(user)
+
+    lines = ["Upcoming bookings of the user:"]
+    for booking in bookings:
+        start = timezone.localtime(booking.booking_datetime).strftime("%Y-%m-%d %H:%M")
+        line = f"- {booking.get_booking_type_display()} on {start}"
+        if booking.booking_end_date:
+            line += f" until {timezone.localtime(booking.booking_end_date).strftime('%Y-%m-%d %H:%M')}"
+        if booking.location:
+            line += f" at {booking.location}"
+        lines.append(line)
+    if not bookings:
+        lines.append("- none")
+
+    if subscription is None:
+        lines.append("Subscription: none (free)")
+    else:
+        line = f"Subscription: {subscription.status}, {'active' if subscription.is_active else 'inactive'}"
+        if subscription.plan:
+            line += f", plan {subscription.plan.name}"
+        if subscription.end_date:
+            line += f", ends {timezone.localtime(subscription.end_date).strftime('%Y-%m-%d')}"
+        lines.append(line)
+
+    expires_in = (bookings[0].booking_datetime - now).total_seconds() if bookings else None
+    return "\n".join(lines), expires_in
+
+
+def get_user_context(user):
+    """
+    The cached context of an authenticated user, built on a miss. Booking writes
+    (signals.py) and subscription writes (payment.subscriptions) drop it in the
+    process that made them; other processes pick the change up within
+    CHATBOT_USER_CONTEXT_TTL. It also expires when the soonest booking starts,
+    since that booking is no longer upcoming.
+    """
+    key = cache_key(user.pk)
+    text = cache.get(key)
+    if text is None:
+        text, expires_in = build_user_context(user)
+        timeout = settings.CHATBOT_USER_CONTEXT_TTL
+        if expires_in is not None:
+            timeout = max(1, min(timeout, int(expires_in) + 1))
+        cache.set(key, text, timeout)
+    return text
+
+
+def invalidate_user_context(user_id):
+    cache.delete(cache_key(user_id))
+
+
+def system_prompt_for(user, system_prompt):
+    """The system prompt with the user's context appended; unchanged for anonymous users."""
+    if not user.is_authenticated:
+        return system_prompt
+    return f"{system_prompt}\n\n{get_user_context(user)}"
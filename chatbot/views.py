@@ -1,47 +1,281 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-import openai
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import IsAdminUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+import json
+from asgiref.sync import sync_to_async
 from django.conf import settings
-import os
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from .cache import alookup, lookup, response_cache
+from .clients import get_async_client, get_client
+from .concurrency import QueueFull, chat_limiter
+from .context import abuild_prompt, build_prompt
+from .ratelimit import RateLimited, rate_limiter
+from .store import append_turns, get_conversation, load_history
+from .streaming import sse, stream_completion
+from .user_context import system_prompt_for
+
+SYSTEM_PROMPT = "You are a helpful chatbot."
+
+
+def _cacheable(conversation, messages):
+    """
+    Only the first question of a conversation is answered from, or stored in,
+    the reply cache. With history or a summary the reply depends on what was
+    said before, and would be served to other conversations asking the same.
+    """
+    return len(messages) == 2 and not conversation.summary
 
-# Create a Client instance with your API key
-client = openai.Client(api_key=os.getenv('OPENAI_API_KEY'))
 
 @api_view(['POST'])
 def chatbot_response(request):
+    try:
+        rate_limiter.check(request.user, request)
+    except RateLimited as e:
+        return Response({"error": str(e)}, status=429, headers={"Retry-After": str(e.retry_after)})
+
     user_message = request.data.get('message', '')
 
     if not user_message:
         return Response({"error": "Message is required"}, status=400)
 
-    # Retrieve conversation history from session or initialize
-    conversation = request.session.get('conversation', [])
+    conversation = get_conversation(request, request.data.get('conversation_id'))
+    if conversation is None:
+        return Response({"error": "Conversation not found"}, status=404)
 
-    # Add the new user message to the conversation
-    conversation.append({"role": "user", "content": user_message})
+    # Retrieve conversation history from the store
+    history = load_history(conversation)
+    user_turn = {"role": "user", "content": user_message}
 
     try:
-        # Call the chat completion endpoint using the new syntax
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful chatbot."},
-                *conversation
-            ],
-            max_tokens=150,
-            temperature=0.7,
+        # Recent turns within the token budget, older ones folded into a summary
+        client = get_client()
+        system_prompt = system_prompt_for(request.user, SYSTEM_PROMPT)
+        messages, metrics = build_prompt(client, conversation, system_prompt, history, user_turn)
+
+        # Repeated questions under the same system prompt are answered from the cache
+        system_prompt = messages[0]["content"]
+        cacheable = _cacheable(conversation, messages)
+        bot_reply, cache_tier, embedding = (
+            lookup(client, system_prompt, user_message) if cacheable else (None, "bypass", None)
         )
+        metrics["cache"] = cache_tier or "miss"
 
-        bot_reply = response.choices[0].message.content.strip()
+        if bot_reply is None:
+            # Call the chat completion endpoint using the new syntax
+            response = client.chat.completions.create(
+                model=settings.CHATBOT_MODEL,
+                messages=messages,
+                max_tokens=150,
+                temperature=0.7,
+            )
+
+            bot_reply = response.choices[0].message.content.strip()
+            if cacheable:
+                response_cache.set(system_prompt, user_message, bot_reply, embedding)
 
-        # Append assistant's reply to the conversation history
-        conversation.append({"role": "assistant", "content": bot_reply})
+            if response.usage:
+                metrics["prompt_tokens"] = response.usage.prompt_tokens
+                metrics["completion_tokens"] = response.usage.completion_tokens
 
-        # Save updated conversation back to the session
-        request.session['conversation'] = conversation
-        request.session.modified = True
+        # Only the two new turns are written
+        append_turns(conversation, [user_turn, {"role": "assistant", "content": bot_reply}])
+        print(f"Chatbot prompt for conversation {conversation.public_id}: {metrics}")
 
-        return Response({"reply": bot_reply})
+        return Response({
+            "reply": bot_reply,
+            "conversation_id": str(conversation.public_id),
+            "usage": metrics,
+        })
 
     except Exception as e:
         return Response({"error": str(e)}, status=500)
+
+
+def _authenticate(request):
+    """JWT auth for plain (non-DRF) views; anonymous when no token is sent. Sets request.auth."""
+    result = JWTAuthentication().authenticate(request)
+    request.auth = result[1] if result else None
+    return result[0] if result else AnonymousUser()
+
+
+def _load_conversation(request, conversation_id):
+    """
+    Auth, rate limit, conversation, history and user context in one trip to the
+    sync (DB) thread.
+    """
+    request.user = _authenticate(request)
+    rate_limiter.check(request.user, request)
+    conversation = get_conversation(request, conversation_id)
+    if conversation is None:
+        return None, [], None
+    return conversation, load_history(conversation), system_prompt_for(request.user, SYSTEM_PROMPT)
+
+
+async def _prepare_chat(request):
+    """
+    Shared request handling of the async chat views.
+    Returns (conversation, user_turn, messages, metrics) or an error JsonResponse.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    user_message = data.get("message", "")
+    if not user_message:
+        return JsonResponse({"error": "Message is required"}, status=400)
+
+    try:
+        conversation, history, system_prompt = await sync_to_async(_load_conversation)(
+            request, data.get("conversation_id")
+        )
+    except AuthenticationFailed as e:
+        return JsonResponse({"error": str(e.detail)}, status=401)
+    except RateLimited as e:
+        response = JsonResponse({"error": str(e)}, status=429)
+        response["Retry-After"] = str(e.retry_after)
+        return response
+    if conversation is None:
+        return JsonResponse({"error": "Conversation not found"}, status=404)
+
+    user_turn = {"role": "user", "content": user_message}
+    try:
+        messages, metrics = await abuild_prompt(get_async_client(), conversation, system_prompt, history, user_turn)
+    except QueueFull:
+        return _busy_response()
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+    return conversation, user_turn, messages, metrics
+
+
+def _busy_response():
+    response = JsonResponse({"error": "The chatbot is busy, please try again shortly"}, status=503)
+    response["Retry-After"] = "5"
+    return response
+
+
+@csrf_exempt
+async def chatbot_response_async(request):
+    """
+    ASGI variant of chatbot_response: the OpenAI round trip is awaited on the
+    shared pooled AsyncClient instead of holding a worker thread, and at most
+    CHATBOT_MAX_CONCURRENCY calls per process are in flight.
+    """
+    prepared = await _prepare_chat(request)
+    if isinstance(prepared, JsonResponse):
+        return prepared
+    conversation, user_turn, messages, metrics = prepared
+
+    system_prompt = messages[0]["content"]
+    cacheable = _cacheable(conversation, messages)
+    bot_reply, cache_tier, embedding = (
+        await alookup(get_async_client(), system_prompt, user_turn["content"]) if cacheable
+        else (None, "bypass", None)
+    )
+    metrics["cache"] = cache_tier or "miss"
+
+    if bot_reply is None:
+        metrics["queue_depth"] = chat_limiter.waiting
+        try:
+            async with chat_limiter.slot():
+                response = await get_async_client().chat.completions.create(
+                    model=settings.CHATBOT_MODEL,
+                    messages=messages,
+                    max_tokens=150,
+                    temperature=0.7,
+                )
+        except QueueFull:
+            return _busy_response()
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=500)
+
+        bot_reply = response.choices[0].message.content.strip()
+        if cacheable:
+            response_cache.set(system_prompt, user_turn["content"], bot_reply, embedding)
+
+        if response.usage:
+            metrics["prompt_tokens"] = response.usage.prompt_tokens
+            metrics["completion_tokens"] = response.usage.completion_tokens
+
+    await sync_to_async(append_turns)(conversation, [user_turn, {"role": "assistant", "content": bot_reply}])
+    print(f"Chatbot prompt for conversation {conversation.public_id}: {metrics}")
+
+    return JsonResponse({
+        "reply": bot_reply,
+        "conversation_id": str(conversation.public_id),
+        "usage": metrics,
+    })
+
+
+@csrf_exempt
+async def chatbot_stream(request):
+    """
+    Streaming variant of chatbot_response. Relays the reply as Server-Sent Events
+    ("meta", then "delta" per chunk, then "done" or "error") and stores the
+    assembled reply once the stream completes. Needs ASGI to stream incrementally.
+    """
+    prepared = await _prepare_chat(request)
+    if isinstance(prepared, JsonResponse):
+        return prepared
+    conversation, user_turn, messages, metrics = prepared
+
+    async def events():
+        yield sse("meta", {"conversation_id": str(conversation.public_id)})
+
+        system_prompt = messages[0]["content"]
+        cacheable = _cacheable(conversation, messages)
+        bot_reply, cache_tier, embedding = (
+            await alookup(get_async_client(), system_prompt, user_turn["content"]) if cacheable
+            else (None, "bypass", None)
+        )
+        metrics["cache"] = cache_tier or "miss"
+
+        if bot_reply is not None:
+            # Cached: the whole reply goes out as a single delta
+            yield sse("delta", {"content": bot_reply})
+        else:
+            metrics["queue_depth"] = chat_limiter.waiting
+            parts = []
+            try:
+                async with chat_limiter.slot():
+                    async for delta in stream_completion(get_async_client(), messages, metrics):
+                        parts.append(delta)
+                        yield sse("delta", {"content": delta})
+            except QueueFull:
+                yield sse("error", {"error": "The chatbot is busy, please try again shortly"})
+                return
+            except Exception as e:
+                yield sse("error", {"error": str(e)})
+                return
+
+            bot_reply = "".join(parts).strip()
+            if cacheable:
+                response_cache.set(system_prompt, user_turn["content"], bot_reply, embedding)
+
+        await sync_to_async(append_turns)(conversation, [user_turn, {"role": "assistant", "content": bot_reply}])
+        print(f"Chatbot stream for conversation {conversation.public_id}: {metrics}")
+        yield sse("done", {"reply": bot_reply, "usage": metrics})
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def chatbot_metrics(request):
+    """Per-process concurrency, queue-depth, response cache and rate limit counters."""
+    return Response({
+        **chat_limiter.stats(),
+        "cache": response_cache.stats(),
+        "rate_limit": rate_limiter.stats(),
+    })
@@ -3,6 +3,7 @@ from django.contrib import admin
 # Register your models here.
 
 
-from .models import Notification
+from .models import Notification, NotificationArchive
 
-admin.site.register(Notification)
\ No newline at end of file
+admin.site.register(Notification)
+admin.site.register(NotificationArchive)
\ No newline at end of file
@@ -1,26 +1,192 @@
 # notifications/jobs.py
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
 from apscheduler.schedulers.background import BackgroundScheduler
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Q
 from django.utils import timezone
-from .models import Notification
-from .send_fcm_notification import send_fcm_notification
+from .leases import acquire_lease, make_owner_id
+from .models import Notification, NotificationArchive, FCMToken
+from .send_fcm_notification import send_fcm_batch
+from .tokens import prune_dead_tokens
+
+NOTIFICATION_TITLE = "Booking Reminder"
+DISPATCHER_LEASE = "notification-dispatcher"
+ARCHIVER_LEASE = "notification-archiver"
+ARCHIVER_LEASE_TTL = 3600  # seconds; held well past the run so no other process repeats it that day
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def claim_due_notifications(claim_token, now, batch_size=None):
+    """
+    Claim up to batch_size due notifications for this dispatcher with a single UPDATE.
+    Rows claimed by a dispatcher that never finished are claimable again after
+    NOTIFICATION_CLAIM_TIMEOUT seconds. Returns the number of claimed rows.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    stale_before = now - timedelta(seconds=settings.NOTIFICATION_CLAIM_TIMEOUT)
+    claimable = Q(sent=False, notify_at__lte=now) & (
+        Q(claim_token__isnull=True) | Q(claimed_at__lt=stale_before)
+    )
+    due_ids = Notification.objects.filter(claimable).order_by("notify_at").values("pk")[:batch_size]
+    # The claimable condition is repeated on the outer UPDATE so a row claimed by
+    # another dispatcher in the meantime is skipped rather than stolen.
+    return Notification.objects.filter(claimable, pk__in=due_ids).update(
+        claim_token=claim_token, claimed_at=now
+    )
+
+
+def dispatch_claimed_notifications(claim_token):
+    """
+    Send every notification claimed under claim_token and mark them sent.
+    Tokens for the whole batch are fetched with one query and the batch is
+    marked sent with one UPDATE.
+    """
+    batch = list(
+        Notification.objects.filter(claim_token=claim_token, sent=False).only("id", "user_id", "message")
+    )
+    if not batch:
+        return {"notifications": 0, "messages": 0, "succeeded": 0, "failed": 0, "tokens_pruned": 0}
+
+    tokens_by_user = defaultdict(list)
+    user_ids = {notification.user_id for notification in batch}
+    live_tokens = FCMToken.objects.filter(user_id__in=user_ids, quarantined_at__isnull=True)
+    for user_id, token in live_tokens.values_list("user_id", "token"):
+        tokens_by_user[user_id].append(token)
+
+    messages = [
+        (token, NOTIFICATION_TITLE, notification.message)
+        for notification in batch
+        for token in tokens_by_user[notification.user_id]
+    ]
+    results = send_fcm_batch(messages)
+    succeeded = sum(1 for result in results if result["success"])
+
+    # Every row in the batch gets the same value, so one UPDATE on the claim is
+    # cheaper than a per-row CASE from bulk_update.
+    Notification.objects.filter(claim_token=claim_token, sent=False).update(sent=True)
+    pruned = prune_dead_tokens(results)
+
+    return {
+        "notifications": len(batch),
+        "messages": len(messages),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "tokens_pruned": pruned["deleted"] + pruned["quarantined"],
+    }
+
+
 def send_due_notifications():
-    print("filter notification")
+    """
+    One scheduler tick: claim and dispatch due notifications batch by batch until
+    none are left or NOTIFICATION_TICK_BUDGET seconds have passed.
+    """
+    started = time.monotonic()
     now = timezone.now()
-    print(now)
-    due_notifications = Notification.objects.filter(sent=False, notify_at__lte=now)
-    
-    print("due_notifications",due_notifications)
-
-    for notification in due_notifications:
-        tokens = list(notification.user.fcm_tokens.values_list("token", flat=True))
-        print("Tokens to send:", tokens)
-
-        for token in tokens:
-            data = send_fcm_notification(token, "Booking Reminder", notification.message)
-            print("daya sent",data)
-        notification.sent = True
-        notification.save()
+    claim_token = uuid.uuid4().hex
+    totals = {"notifications": 0, "messages": 0, "succeeded": 0, "failed": 0, "tokens_pruned": 0, "batches": 0}
+
+    while time.monotonic() - started < settings.NOTIFICATION_TICK_BUDGET:
+        if not claim_due_notifications(claim_token, now):
+            break
+        stats = dispatch_claimed_notifications(claim_token)
+        totals["batches"] += 1
+        for key, value in stats.items():
+            totals[key] += value
+
+    elapsed = time.monotonic() - started
+    totals["elapsed"] = elapsed
+    totals["per_second"] = totals["notifications"] / elapsed if elapsed else 0
+    print(
+        f"Notification tick: {totals['notifications']} notifications in {totals['batches']} batches, "
+        f"{totals['messages']} messages ({totals['succeeded']} ok, {totals['failed']} failed, "
+        f"{totals['tokens_pruned']} tokens pruned) "
+        f"in {elapsed:.2f}s ({totals['per_second']:.1f}/s)"
+    )
+    return totals
+
+
+def archive_sent_notifications(retention_days=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move sent notifications older than retention_days into NotificationArchive,
+    one batch per transaction, so the due-queue table only holds live rows.
+    Returns the number of archived rows.
+    """
+    if retention_days is None:
+        retention_days = settings.NOTIFICATION_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    archived = 0
+    last_pk = 0
+
+    while True:
+        # Walk the primary key so each batch continues where the last one stopped
+        rows = list(
+            Notification.objects.filter(pk__gt=last_pk, sent=True, notify_at__lt=cutoff)
+            .order_by("pk")
+            .values("pk", "user_id", "message", "notify_at", "created_at")[:batch_size]
+        )
+        if not rows:
+            break
+
+        with transaction.atomic():
+            NotificationArchive.objects.bulk_create(
+                [
+                    NotificationArchive(
+                        original_id=row["pk"],
+                        user_id=row["user_id"],
+                        message=row["message"],
+                        notify_at=row["notify_at"],
+                        created_at=row["created_at"],
+                    )
+                    for row in rows
+                ],
+                ignore_conflicts=True,
+            )
+            Notification.objects.filter(pk__in=[row["pk"] for row in rows]).delete()
+
+        archived += len(rows)
+        last_pk = rows[-1]["pk"]
+
+    print(f"Archived {archived} sent notifications older than {retention_days} days")
+    return archived
+
+
+def run_leased(lease_name, owner, job, ttl=None):
+    """
+    Run `job` only if `owner` holds `lease_name`, so that among all processes
+    sharing the database exactly one runs it at a time. ttl defaults to
+    NOTIFICATION_LEASE_TTL.
+    """
+    try:
+        if not acquire_lease(lease_name, owner, ttl or settings.NOTIFICATION_LEASE_TTL):
+            return None
+        return job()
+    except DatabaseError as e:
+        # e.g. tables not migrated yet while running manage.py migrate
+        print(f"{lease_name} skipped:", e)
+        return None
+
+
 def start():
+    # "off" leaves dispatching to `manage.py run_notification_dispatcher`
+    if settings.NOTIFICATION_SCHEDULER_MODE == "off":
+        return
+
     scheduler = BackgroundScheduler()
-    scheduler.add_job(send_due_notifications, 'interval', minutes=1)  # every 1 min check
+    # every 1 min check; a tick still running when the next one is due is not doubled up
+    owner = make_owner_id()
+    scheduler.add_job(
+        run_leased, 'interval', minutes=1, args=[DISPATCHER_LEASE, owner, send_due_notifications],
+        max_instances=1, coalesce=True
+    )
+    # A fixed wall-clock time, so every process competes for the same run and the
+    # long lease keeps the losers from running it again once a short one expired
+    scheduler.add_job(
+        run_leased, 'cron', hour=3, args=[ARCHIVER_LEASE, owner, archive_sent_notifications, ARCHIVER_LEASE_TTL],
+        max_instances=1, coalesce=True
+    )
     scheduler.start()
@@ -0,0 +1,43 @@
+# notification/leases.py
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import SchedulerLease
+
+
+def make_owner_id():
+    """Identify the current process, unique across hosts and restarts."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(name, owner, ttl_seconds):
+    """
+    Take or renew the lease `name` for `owner`. Succeeds when the lease is free,
+    expired, or already held by `owner`; the check and the write are one UPDATE.
+    Returns True if `owner` holds the lease afterwards.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    updated = SchedulerLease.objects.filter(
+        Q(owner=owner) | Q(expires_at__lte=now), name=name
+    ).update(owner=owner, expires_at=expires_at)
+    if updated:
+        return True
+
+    try:
+        with transaction.atomic():
+            SchedulerLease.objects.create(name=name, owner=owner, expires_at=expires_at)
+        return True
+    except IntegrityError:
+        # The lease exists and somebody else holds it
+        return False
+
+
+def release_lease(name, owner):
+    """Give the lease up early so another process can take over without waiting for expiry."""
+    SchedulerLease.objects.filter(name=name, owner=owner).update(expires_at=timezone.now())
@@ -0,0 +1,20 @@
+# notification/management/commands/archive_notifications.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from notification.jobs import archive_sent_notifications
+
+
+class Command(BaseCommand):
+    help = "Move sent notifications past the retention window into the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.NOTIFICATION_RETENTION_DAYS,
+            help="Archive sent notifications older than this many days.",
+        )
+
+    def handle(self, *args, **options):
+        archived = archive_sent_notifications(retention_days=options["days"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} notifications"))
@@ -0,0 +1,23 @@
+# notification/management/commands/benchmark_fcm_sender.py
+from django.core.management.base import BaseCommand
+from notification.send_fcm_notification import StubFCMTransport, send_fcm_notifications
+
+
+class Command(BaseCommand):
+    help = "Benchmark the async FCM sender against the local stub transport (no network)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=10000)
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per send.")
+
+    def handle(self, *args, **options):
+        transport = StubFCMTransport(latency=options["latency"])
+        messages = [(f"token-{i}", "Booking Reminder", "Benchmark") for i in range(options["messages"])]
+
+        report = send_fcm_notifications(messages, concurrency=options["concurrency"], transport=transport)
+
+        self.stdout.write(
+            f"{report['sent']} sends in {report['elapsed']:.2f}s ({report['per_second']:.0f}/s), "
+            f"{report['succeeded']} ok, {report['failed']} failed, peak concurrency {transport.peak_in_flight}"
+        )
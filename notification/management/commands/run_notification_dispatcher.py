@@ -0,0 +1,43 @@
+# notification/management/commands/run_notification_dispatcher.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from notification.jobs import DISPATCHER_LEASE, send_due_notifications
+from notification.leases import acquire_lease, make_owner_id, release_lease
+
+
+class Command(BaseCommand):
+    help = "Run the notification dispatch loop outside the web workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=int, default=60, help="Seconds between ticks.")
+        parser.add_argument("--once", action="store_true", help="Run a single tick and exit.")
+        parser.add_argument(
+            "--no-lease",
+            action="store_true",
+            help="Skip the dispatcher lease and share due rows with other dispatchers through row claims.",
+        )
+
+    def handle(self, *args, **options):
+        owner = make_owner_id()
+        use_lease = not options["no_lease"]
+        self.stdout.write(f"Notification dispatcher {owner} started (lease={'on' if use_lease else 'off'})")
+
+        try:
+            while True:
+                started = time.monotonic()
+                if use_lease and not acquire_lease(DISPATCHER_LEASE, owner, settings.NOTIFICATION_LEASE_TTL):
+                    self.stdout.write("Lease held by another dispatcher, waiting")
+                else:
+                    send_due_notifications()
+
+                if options["once"]:
+                    break
+                time.sleep(max(0, options["interval"] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if use_lease:
+                release_lease(DISPATCHER_LEASE, owner)
+            self.stdout.write("Notification dispatcher stopped")
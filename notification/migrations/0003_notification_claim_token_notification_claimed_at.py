@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0002_fcmtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='claim_token',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
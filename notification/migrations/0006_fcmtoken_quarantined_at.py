@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0005_notificationarchive_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fcmtoken',
+            name='quarantined_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0002_booking_booking_end_date'),
+        ('notification', '0006_fcmtoken_quarantined_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='booking',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reminders', to='booking.booking'),
+        ),
+    ]
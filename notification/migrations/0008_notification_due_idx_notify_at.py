@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0007_notification_booking'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notification_due_idx',
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('sent', False)), fields=['notify_at'], name='notification_due_idx'),
+        ),
+    ]
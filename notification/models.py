@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -7,19 +8,61 @@ User = get_user_model()
 class Notification(models.Model):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="notifications")
+    # Booking this reminder belongs to; pending reminders are rescheduled or cancelled with it
+    booking = models.ForeignKey(
+        "booking.Booking", on_delete=models.SET_NULL, related_name="reminders", blank=True, null=True)
     message = models.TextField(blank=True, null=True)
     notify_at = models.DateTimeField()
     sent = models.BooleanField(default=False)
+    # Set by the dispatcher that claimed this row for sending (see jobs.py)
+    claim_token = models.CharField(max_length=32, blank=True, null=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Due-queue lookup (sent=False, notify_at <= now, oldest first). notify_at alone,
+            # partial on sent=False: with sent leading, SQLite matches `NOT "sent"` against the
+            # first column and never uses the notify_at range or order. MySQL/Oracle ignore the
+            # condition and get a plain notify_at index.
+            models.Index(fields=["notify_at"], condition=Q(sent=False), name="notification_due_idx"),
+        ]
+
     def __str__(self):
         return f"Notification for {self.user.email} at {self.notify_at}"
 
 
+class NotificationArchive(models.Model):
+    """Sent notifications moved out of the hot Notification table by the retention job."""
+    original_id = models.BigIntegerField(unique=True)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_notifications")
+    message = models.TextField(blank=True, null=True)
+    notify_at = models.DateTimeField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived notification for {self.user_id} at {self.notify_at}"
+
+
 class FCMToken(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="fcm_tokens")
     token = models.TextField(unique=True)
+    # Set when FCM rejects the token as invalid; quarantined tokens are skipped by the dispatcher
+    quarantined_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.user.username} - {self.token[:10]}..."
+
+
+class SchedulerLease(models.Model):
+    """A named, expiring lock that lets exactly one process own a scheduled loop."""
+    name = models.CharField(max_length=100, unique=True)
+    owner = models.CharField(max_length=200, blank=True, default="")
+    expires_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} held by {self.owner or 'nobody'} until {self.expires_at}"
@@ -1,6 +1,85 @@
 # notification/send_fcm_notification.py
 from .firebase_init import *  # MUST be imported first
-from firebase_admin import messaging
+import asyncio
+import random
+import time
+
+import firebase_admin
+import google.auth.transport.requests
+import httpx
+from django.conf import settings
+from firebase_admin import exceptions, messaging
+
+# FCM accepts at most 500 messages per send_each call
+FCM_BATCH_LIMIT = 500
+FCM_SEND_URL = "https://fcm.googleapis.com/v1/projects/{project_id}/messages:send"
+
+# Failure reasons attached to failed send results
+UNREGISTERED = "unregistered"  # token is dead, delete it
+INVALID_ARGUMENT = "invalid_argument"  # token rejected as malformed, quarantine it
+TRANSIENT = "transient"  # worth retrying
+FAILED = "failed"  # anything else, not token specific
+
+TRANSIENT_ERRORS = (
+    exceptions.UnavailableError,
+    exceptions.InternalError,
+    exceptions.ResourceExhaustedError,
+    exceptions.DeadlineExceededError,
+    exceptions.UnknownError,
+)
+# FCM v1 error codes and HTTP statuses, used for the raw HTTP transport
+ERROR_CODE_REASONS = {
+    "UNREGISTERED": UNREGISTERED,
+    "SENDER_ID_MISMATCH": UNREGISTERED,
+    "QUOTA_EXCEEDED": TRANSIENT,
+    "UNAVAILABLE": TRANSIENT,
+    "INTERNAL": TRANSIENT,
+}
+STATUS_REASONS = {404: UNREGISTERED, 429: TRANSIENT, 500: TRANSIENT, 503: TRANSIENT, 504: TRANSIENT}
+
+
+def names_token(message):
+    """
+    Whether an INVALID_ARGUMENT error blames the registration token. FCM raises
+    the same code for payload problems (e.g. an oversized message), which say
+    nothing about the token and must not get it quarantined.
+    """
+    return "registration token" in (message or "").lower()
+
+
+def classify_fcm_exception(exc):
+    """Map a firebase_admin exception to one of the failure reasons above."""
+    if isinstance(exc, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+        return UNREGISTERED
+    if isinstance(exc, exceptions.InvalidArgumentError):
+        return INVALID_ARGUMENT if names_token(str(exc)) else FAILED
+    if isinstance(exc, TRANSIENT_ERRORS):
+        return TRANSIENT
+    if isinstance(exc, exceptions.FirebaseError):
+        return FAILED
+    # Network level errors (timeouts, resets) raised outside the Firebase hierarchy
+    return TRANSIENT
+
+
+def classify_fcm_response(status, payload):
+    """Map an FCM HTTP v1 error response to one of the failure reasons above."""
+    error = payload.get("error", {}) if isinstance(payload, dict) else {}
+    for detail in error.get("details", []):
+        code = detail.get("errorCode")
+        if code == "INVALID_ARGUMENT":
+            return INVALID_ARGUMENT if names_token(error.get("message")) else FAILED
+        reason = ERROR_CODE_REASONS.get(code)
+        if reason:
+            return reason
+    if status == 400:
+        return INVALID_ARGUMENT if names_token(error.get("message")) else FAILED
+    return STATUS_REASONS.get(status, FAILED)
+
+
+def retry_delay(attempt):
+    """Exponential backoff with jitter: ~0.5s, 1s, 2s, ..."""
+    return settings.FCM_RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random())
+
 
 def send_fcm_notification(token, title, body):
     message = messaging.Message(
@@ -17,3 +96,193 @@ def send_fcm_notification(token, title, body):
     except Exception as e:
         print("Error sending message:", e)
         return {"success": False, "error": str(e)}
+
+
+def _send_each_chunk(chunk):
+    batch = [
+        messaging.Message(
+            notification=messaging.Notification(title=title, body=body),
+            token=token
+        )
+        for token, title, body in chunk
+    ]
+    try:
+        batch_response = messaging.send_each(batch)
+    except Exception as e:
+        # The request as a whole failed, which says nothing about any one token: retry the chunk
+        print("Error sending batch:", e)
+        return [{"token": token, "success": False, "error": str(e), "reason": TRANSIENT} for token, _, _ in chunk]
+
+    results = []
+    for (token, _, _), response in zip(chunk, batch_response.responses):
+        if response.success:
+            results.append({"token": token, "success": True, "response": response.message_id})
+        else:
+            results.append({
+                "token": token,
+                "success": False,
+                "error": str(response.exception),
+                "reason": classify_fcm_exception(response.exception),
+            })
+    return results
+
+
+def send_fcm_batch(messages):
+    """
+    Send a list of (token, title, body) tuples with messaging.send_each,
+    FCM_BATCH_LIMIT messages per request. Transient failures are retried up to
+    FCM_MAX_RETRIES times with backoff.
+    Returns one result dict per input tuple, in the same order.
+    """
+    results = []
+    for start in range(0, len(messages), FCM_BATCH_LIMIT):
+        results.extend(_send_each_chunk(messages[start:start + FCM_BATCH_LIMIT]))
+
+    for attempt in range(settings.FCM_MAX_RETRIES):
+        retry_indexes = [i for i, result in enumerate(results) if result.get("reason") == TRANSIENT]
+        if not retry_indexes:
+            break
+        time.sleep(retry_delay(attempt))
+        for start in range(0, len(retry_indexes), FCM_BATCH_LIMIT):
+            chunk_indexes = retry_indexes[start:start + FCM_BATCH_LIMIT]
+            retried = _send_each_chunk([messages[i] for i in chunk_indexes])
+            for i, result in zip(chunk_indexes, retried):
+                results[i] = result
+    return results
+
+
+class HttpFCMTransport:
+    """
+    Sends through the FCM HTTP v1 API over one shared httpx.AsyncClient, so every
+    send reuses pooled keep-alive connections and a cached OAuth access token.
+    """
+
+    def __init__(self, app=None, max_connections=None):
+        app = app or firebase_admin.get_app()
+        self.url = FCM_SEND_URL.format(project_id=app.project_id)
+        self.credential = app.credential.get_credential()
+        self.max_connections = max_connections or settings.FCM_ASYNC_CONCURRENCY
+        self.client = None
+        self._token_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+        self.client = None
+
+    async def _access_token(self):
+        async with self._token_lock:
+            if not self.credential.valid:
+                # google-auth refreshes synchronously, keep it off the event loop
+                await asyncio.to_thread(self.credential.refresh, google.auth.transport.requests.Request())
+            return self.credential.token
+
+    async def send(self, token, title, body):
+        access_token = await self._access_token()
+        response = await self.client.post(
+            self.url,
+            headers={"Authorization": f"Bearer {access_token}"},
+            json={"message": {"token": token, "notification": {"title": title, "body": body}}},
+        )
+        if response.status_code == 200:
+            return {"success": True, "response": response.json().get("name")}
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        return {
+            "success": False,
+            "error": response.text,
+            "status": response.status_code,
+            "reason": classify_fcm_response(response.status_code, payload),
+        }
+
+
+class StubFCMTransport:
+    """
+    Offline stand-in for Firebase: waits `latency` seconds per send and fails the
+    tokens listed in `failing_tokens`. Tracks peak concurrency for benchmarks.
+    """
+
+    def __init__(self, latency=0.05, failing_tokens=()):
+        self.latency = latency
+        self.failing_tokens = set(failing_tokens)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    async def send(self, token, title, body):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        if token in self.failing_tokens:
+            return {
+                "success": False,
+                "error": "Requested entity was not found.",
+                "status": 404,
+                "reason": UNREGISTERED,
+            }
+        return {"success": True, "response": f"projects/stub/messages/{self.calls}"}
+
+
+async def send_fcm_notifications_async(messages, concurrency=None, transport=None):
+    """
+    Send (token, title, body) tuples concurrently, at most `concurrency` in flight,
+    over one transport session. Returns a report with one result per message.
+    """
+    concurrency = concurrency or settings.FCM_ASYNC_CONCURRENCY
+    transport = transport or HttpFCMTransport(max_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_one(token, title, body):
+        for attempt in range(settings.FCM_MAX_RETRIES + 1):
+            async with semaphore:
+                try:
+                    result = await transport.send(token, title, body)
+                except Exception as e:
+                    result = {"success": False, "error": str(e), "reason": TRANSIENT}
+            if result.get("reason") != TRANSIENT or attempt == settings.FCM_MAX_RETRIES:
+                break
+            # Back off outside the semaphore so waiting retries don't hold a slot
+            await asyncio.sleep(retry_delay(attempt))
+        result["token"] = token
+        return result
+
+    started = time.monotonic()
+    async with transport:
+        results = await asyncio.gather(*(send_one(*message) for message in messages))
+    elapsed = time.monotonic() - started
+
+    succeeded = sum(1 for result in results if result["success"])
+    return {
+        "sent": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "elapsed": elapsed,
+        "per_second": len(results) / elapsed if elapsed else 0,
+        "results": results,
+    }
+
+
+def send_fcm_notifications(messages, concurrency=None, transport=None):
+    """Blocking wrapper around send_fcm_notifications_async for sync callers."""
+    return asyncio.run(send_fcm_notifications_async(messages, concurrency=concurrency, transport=transport))
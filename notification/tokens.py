@@ -0,0 +1,30 @@
+# notification/tokens.py
+from django.utils import timezone
+from .models import FCMToken
+from .send_fcm_notification import INVALID_ARGUMENT, UNREGISTERED
+
+# Keep IN (...) lists under SQLite's bound-parameter limit
+PRUNE_CHUNK_SIZE = 500
+
+
+def prune_dead_tokens(results):
+    """
+    Delete tokens FCM reported as unregistered and quarantine tokens it rejected
+    as invalid, based on send results carrying a "reason".
+    Returns {"deleted": n, "quarantined": n}.
+    """
+    dead = sorted({result["token"] for result in results if result.get("reason") == UNREGISTERED})
+    invalid = sorted({result["token"] for result in results if result.get("reason") == INVALID_ARGUMENT})
+    now = timezone.now()
+    deleted = quarantined = 0
+
+    for start in range(0, len(dead), PRUNE_CHUNK_SIZE):
+        deleted += FCMToken.objects.filter(token__in=dead[start:start + PRUNE_CHUNK_SIZE]).delete()[0]
+    for start in range(0, len(invalid), PRUNE_CHUNK_SIZE):
+        quarantined += FCMToken.objects.filter(
+            token__in=invalid[start:start + PRUNE_CHUNK_SIZE], quarantined_at__isnull=True
+        ).update(quarantined_at=now)
+
+    if deleted or quarantined:
+        print(f"Pruned FCM tokens: {deleted} deleted, {quarantined} quarantined")
+    return {"deleted": deleted, "quarantined": quarantined}
@@ -16,4 +16,8 @@ def save_fcm_token(request):
     
     # Create or ignore if already exists
     obj, created = FCMToken.objects.get_or_create(user=request.user, token=token)
+    if obj.quarantined_at:
+        # The device registered the token again, give it another chance
+        obj.quarantined_at = None
+        obj.save(update_fields=["quarantined_at"])
     return Response({"success": True, "created": created})
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Subscription, SubscriptionPlan, Description
+from .models import Subscription, SubscriptionPlan, Description, Invoice, WebhookEvent
 
 # Inline admin for Description (to be displayed directly in SubscriptionPlan admin)
 class DescriptionInline(admin.TabularInline):
@@ -25,7 +25,24 @@ class DescriptionAdmin(admin.ModelAdmin):
     list_display = ('plan', 'text', 'created_at')  # Plan and Description text
     search_fields = ('text',)  # Searching by description text
 
+# Webhook inbox Admin
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = (
+        'event_id', 'type', 'subscription_key', 'status', 'attempts', 'next_attempt_at', 'received_at', 'processed_at'
+    )
+    search_fields = ('event_id', 'subscription_key')
+    list_filter = ('status', 'type')
+    readonly_fields = ('payload',)
+
+# Invoice Admin
+class InvoiceAdmin(admin.ModelAdmin):
+    list_display = ('stripe_invoice_id', 'user', 'status', 'amount_paid', 'currency', 'created')
+    search_fields = ('stripe_invoice_id', 'stripe_subscription_id', 'user__email')
+    list_filter = ('status',)
+
 # Registering the models with the custom admin views
 admin.site.register(Subscription, SubscriptionAdmin)
 admin.site.register(SubscriptionPlan, SubscriptionPlanAdmin)
 admin.site.register(Description, DescriptionAdmin)
+admin.site.register(WebhookEvent, WebhookEventAdmin)
+admin.site.register(Invoice, InvoiceAdmin)
@@ -0,0 +1,57 @@
+# payment/catalog.py
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import SubscriptionPlan
+from .serializers import SubscriptionPlanSerializer
+
+VERSION_KEY = "payment:plan_catalog:version"
+CATALOG_KEY = "payment:plan_catalog:{}"
+
+
+def catalog_version():
+    # Start from the clock, not 1, so a fresh version never matches an entry
+    # left in a shared cache by an earlier deployment
+    return cache.get_or_set(VERSION_KEY, lambda: int(time.time() * 1000), timeout=settings.PLAN_CATALOG_TTL)
+
+
+def bump_catalog_version():
+    """
+    Make the next request of this process rebuild the catalog. With a
+    per-process cache, other processes only see the edit once their version
+    and catalog entries expire, at most PLAN_CATALOG_TTL seconds later.
+    """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Not set yet (or evicted)
+        catalog_version()
+
+
+def get_plan_catalog():
+    """
+    (data, etag) of the serialized plan list. Built once per catalog version
+    with the descriptions prefetched, then served from the cache for up to
+    PLAN_CATALOG_TTL seconds.
+    """
+    key = CATALOG_KEY.format(catalog_version())
+    catalog = cache.get(key)
+    if catalog is None:
+        plans = SubscriptionPlan.objects.prefetch_related('descriptions').order_by('id')
+        data = json.loads(json.dumps(SubscriptionPlanSerializer(plans, many=True).data, cls=DjangoJSONEncoder))
+        digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:32]
+        catalog = (data, f'"{digest}"')
+        cache.set(key, catalog, timeout=settings.PLAN_CATALOG_TTL)
+    return catalog
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
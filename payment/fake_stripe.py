@@ -0,0 +1,84 @@
+# payment/fake_stripe.py
+"""
+A local stand-in for the Stripe subscriptions list API, for tests and
+benchmarks. Point the client at it with stripe.api_base = <returned url>.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_subscription(subscription_id, price_id, user_id=None, status="active", period_start=None, days=30,
+                      cancel_at_period_end=False):
+    """A Stripe subscription object with the fields the reconciliation reads."""
+    period_start = period_start or int(time.time())
+    return {
+        "id": subscription_id,
+        "object": "subscription",
+        "status": status,
+        "cancel_at_period_end": cancel_at_period_end,
+        "metadata": {"user_id": str(user_id)} if user_id else {},
+        "items": {
+            "object": "list",
+            "data": [{
+                "id": f"si_{subscription_id}",
+                "object": "subscription_item",
+                "current_period_start": period_start,
+                "current_period_end": period_start + days * 86400,
+                "price": {"id": price_id, "object": "price"},
+            }],
+        },
+    }
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/v1/subscriptions":
+            self.send_json(404, {"error": {"type": "invalid_request_error", "message": f"Unknown path {url.path}"}})
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        limit = int(query.get("limit", 10))
+        subscriptions = self.server.subscriptions
+        start = 0
+        if "starting_after" in query:
+            start = self.server.positions[query["starting_after"]] + 1
+        page = subscriptions[start:start + limit]
+        self.server.requests += 1
+        self.send_json(200, {
+            "object": "list",
+            "url": "/v1/subscriptions",
+            "has_more": start + limit < len(subscriptions),
+            "data": page,
+        })
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_fake_stripe_server(subscriptions, port=0):
+    """
+    Serve `subscriptions` (list of dicts, e.g. from fake_subscription) on
+    127.0.0.1 in a daemon thread. Returns (server, api_base); server.requests
+    counts the pages served. Call server.shutdown() when done.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeStripeHandler)
+    server.daemon_threads = True
+    server.subscriptions = subscriptions
+    server.positions = {subscription["id"]: index for index, subscription in enumerate(subscriptions)}
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
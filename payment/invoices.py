@@ -0,0 +1,84 @@
+# payment/invoices.py
+from datetime import datetime, timezone as dt_timezone
+
+import stripe
+
+from .models import Invoice, Subscription
+from .stripe_data import details_from_invoice, invoice_subscription_id
+
+INVOICE_UPDATE_FIELDS = [
+    'user', 'stripe_subscription_id', 'status', 'amount_paid', 'currency', 'invoice_pdf',
+    'period_start', 'period_end', 'created', 'updated_at',
+]
+UPSERT_BATCH_SIZE = 100
+# Invoice statuses only move forward; a late event for an earlier state must not undo a later one
+STATUS_ORDER = {"draft": 0, "open": 1, "uncollectible": 2, "paid": 3, "void": 3}
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc) if value else None
+
+
+def build_invoice(obj, user_id):
+    """An unsaved Invoice from a Stripe invoice object (webhook payload or API)."""
+    details = details_from_invoice(obj)
+    return Invoice(
+        stripe_invoice_id=obj["id"],
+        user_id=user_id,
+        stripe_subscription_id=invoice_subscription_id(obj),
+        status=obj.get("status"),
+        amount_paid=obj.get("amount_paid") or 0,
+        currency=obj.get("currency"),
+        invoice_pdf=obj.get("invoice_pdf"),
+        period_start=_timestamp(details["period_start"] or obj.get("period_start")),
+        period_end=_timestamp(details["period_end"] or obj.get("period_end")),
+        created=_timestamp(obj["created"]),
+    )
+
+
+def upsert_invoices(invoices):
+    """Insert or update by stripe_invoice_id, one statement per batch."""
+    return Invoice.objects.bulk_create(
+        invoices,
+        batch_size=UPSERT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['stripe_invoice_id'],
+        update_fields=INVOICE_UPDATE_FIELDS,
+    )
+
+
+def owners_by_subscription(stripe_subscription_ids):
+    """{stripe subscription id: user id} from the local subscriptions, in one query."""
+    return dict(
+        Subscription.objects.filter(stripe_subscription_id__in=set(stripe_subscription_ids))
+        .values_list('stripe_subscription_id', 'user_id')
+    )
+
+
+def record_invoice(obj):
+    """
+    Mirror an invoice from a webhook event, unless the stored copy is already
+    further along (e.g. a late invoice.created after invoice.paid). The owner
+    comes from the subscription metadata, else from the local subscription row.
+    Returns the owner's user id, or None.
+    """
+    user_id = details_from_invoice(obj)["user_id"]
+    if not user_id:
+        subscription_id = invoice_subscription_id(obj)
+        user_id = owners_by_subscription([subscription_id]).get(subscription_id) if subscription_id else None
+
+    stored = Invoice.objects.filter(stripe_invoice_id=obj["id"]).values_list('status', flat=True).first()
+    if stored and STATUS_ORDER.get(stored, 0) > STATUS_ORDER.get(obj.get("status"), 0):
+        return user_id
+    upsert_invoices([build_invoice(obj, user_id)])
+    return user_id
+
+
+def sync_invoices(user, stripe_subscription_id):
+    """Fetch every invoice of the subscription from Stripe into the local table."""
+    invoices = [
+        build_invoice(inv, user.id)
+        for inv in stripe.Invoice.list(subscription=stripe_subscription_id, limit=100).auto_paging_iter()
+    ]
+    upsert_invoices(invoices)
+    return len(invoices)
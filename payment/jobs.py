@@ -0,0 +1,190 @@
+# payment/jobs.py
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from functools import partial
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from notification.jobs import run_leased
+from notification.leases import acquire_lease, make_owner_id
+from . import stripe_data
+from .models import Subscription, WebhookEvent
+from .reconcile import reconcile_subscriptions
+from .subscriptions import invalidate_subscription_caches
+from .webhooks import WebhookError, process_event
+
+WEBHOOK_INBOX_LEASE = "payment-webhook-inbox"
+EXPIRY_SWEEPER_LEASE = "payment-expiry-sweeper"
+RECONCILER_LEASE = "payment-stripe-reconciler"
+RECONCILER_LEASE_TTL = 3600  # seconds; held well past the run so no other process repeats it that night
+
+
+def retry_delay(attempts):
+    """Seconds before the next try of an event that failed `attempts` times."""
+    return settings.WEBHOOK_RETRY_BACKOFF * 2 ** (attempts - 1)
+
+
+def _process_key(events):
+    """
+    Apply the pending events of one subscription key in order. A failure that
+    may succeed later stops the key, so later events never overtake it.
+    Returns (done, failed, retried).
+    """
+    done = failed = retried = 0
+    try:
+        for webhook_event in events:
+            try:
+                with transaction.atomic():
+                    process_event(webhook_event)
+                    WebhookEvent.objects.filter(pk=webhook_event.pk).update(
+                        status="done", attempts=webhook_event.attempts + 1, next_attempt_at=None,
+                        processed_at=timezone.now(),
+                    )
+                done += 1
+                continue
+            except WebhookError as e:
+                status = "failed"
+                error = e
+            except Exception as e:
+                # WebhookRetry and anything unexpected (DB, Stripe API) may succeed later
+                error = e
+                exhausted = webhook_event.attempts + 1 >= settings.WEBHOOK_MAX_ATTEMPTS
+                status = "failed" if exhausted else "pending"
+
+            print(f"Webhook event {webhook_event.event_id} ({webhook_event.type}) failed: {error}")
+            now = timezone.now()
+            WebhookEvent.objects.filter(pk=webhook_event.pk).update(
+                status=status, attempts=webhook_event.attempts + 1, last_error=str(error),
+                next_attempt_at=now + timedelta(seconds=retry_delay(webhook_event.attempts + 1))
+                if status == "pending" else None,
+                processed_at=now if status == "failed" else None,
+            )
+            if status == "pending":
+                retried += 1
+                break
+            failed += 1
+    finally:
+        # Worker threads get their own connection; don't leave it open
+        connection.close()
+    return done, failed, retried
+
+
+def process_webhook_inbox(workers=None, batch_size=None, owner=None):
+    """
+    Apply pending inbox events, oldest first. Keys are spread over a pool of
+    workers; each key's events run sequentially on one worker, and a key whose
+    first event is waiting for a retry is skipped. Meant to run in one process
+    at a time, under WEBHOOK_INBOX_LEASE held by `owner`: the lease is renewed
+    while the pass runs, and keys not started yet are dropped if it was lost.
+    """
+    workers = workers or settings.WEBHOOK_INBOX_WORKERS
+    batch_size = batch_size or settings.WEBHOOK_INBOX_BATCH_SIZE
+    totals = {"done": 0, "failed": 0, "retried": 0}
+
+    now = timezone.now()
+    pending = WebhookEvent.objects.filter(status="pending").order_by("id")[:batch_size]
+    by_key = OrderedDict()
+    for webhook_event in pending:
+        by_key.setdefault(webhook_event.subscription_key, []).append(webhook_event)
+    by_key = OrderedDict(
+        (key, events) for key, events in by_key.items()
+        if events[0].next_attempt_at is None or events[0].next_attempt_at <= now
+    )
+    if not by_key:
+        return totals
+
+    renewed = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_process_key, events) for events in by_key.values()]
+        for future in as_completed(futures):
+            done, failed, retried = future.result()
+            totals["done"] += done
+            totals["failed"] += failed
+            totals["retried"] += retried
+
+            if owner and time.monotonic() - renewed > settings.WEBHOOK_INBOX_LEASE_TTL / 3:
+                renewed = time.monotonic()
+                if not acquire_lease(WEBHOOK_INBOX_LEASE, owner, settings.WEBHOOK_INBOX_LEASE_TTL):
+                    print("Webhook inbox lease lost, stopping the pass")
+                    pool.shutdown(cancel_futures=True)
+                    break
+
+    stripe_stats = stripe_data.stats()
+    print(
+        f"Webhook inbox: {totals['done']} applied, {totals['failed']} failed, {totals['retried']} to retry; "
+        f"Stripe lookups saved {stripe_stats['saved_calls']}, made {stripe_stats['api_calls']}"
+    )
+    return totals
+
+
+def sweep_expired_subscriptions(batch_size=None, time_budget=None):
+    """
+    Deactivate subscriptions whose end_date has passed, one UPDATE per batch of
+    at most batch_size rows, until none are left or time_budget seconds are spent.
+    The UPDATE re-checks is_active, so concurrent sweeps never count a row twice.
+    Returns the number of deactivated subscriptions.
+    """
+    batch_size = batch_size or settings.SUBSCRIPTION_SWEEP_BATCH_SIZE
+    time_budget = time_budget or settings.SUBSCRIPTION_SWEEP_BUDGET
+    started = time.monotonic()
+    now = timezone.now()
+    expired = Subscription.objects.filter(is_active=True, end_date__lte=now)
+    deactivated = batches = 0
+
+    while time.monotonic() - started < time_budget:
+        rows = list(expired.order_by('end_date').values_list('id', 'user_id')[:batch_size])
+        if not rows:
+            break
+        # update() skips save() and its signals, so the per-user caches are dropped here
+        deactivated += expired.filter(pk__in=[pk for pk, _ in rows]).update(is_active=False, updated_at=now)
+        invalidate_subscription_caches({user_id for _, user_id in rows})
+        batches += 1
+
+    remaining = expired.exists()
+    print(
+        f"Subscription sweep: {deactivated} deactivated in {batches} batches, "
+        f"{time.monotonic() - started:.1f}s{', more left for the next run' if remaining else ''}"
+    )
+    return deactivated
+
+
+def reconcile_stripe_subscriptions():
+    report = reconcile_subscriptions()
+    print(
+        f"Stripe reconciliation: {report['updated']} updated, {report['unchanged']} unchanged, "
+        f"{report['not_in_local']} not in the local table, {report['not_in_stripe']} local rows not in Stripe"
+    )
+    return report
+
+
+def start():
+    # "off" leaves the inbox, the expiry sweep and the reconciliation to `manage.py
+    # process_webhook_inbox`, `sweep_expired_subscriptions` and `reconcile_stripe_subscriptions`
+    if settings.WEBHOOK_SCHEDULER_MODE == "off":
+        return
+
+    scheduler = BackgroundScheduler()
+    owner = make_owner_id()
+    scheduler.add_job(
+        run_leased, 'interval', seconds=settings.WEBHOOK_INBOX_INTERVAL,
+        args=[
+            WEBHOOK_INBOX_LEASE, owner, partial(process_webhook_inbox, owner=owner),
+            settings.WEBHOOK_INBOX_LEASE_TTL,
+        ],
+        max_instances=1, coalesce=True
+    )
+    scheduler.add_job(
+        run_leased, 'interval', minutes=5, args=[EXPIRY_SWEEPER_LEASE, owner, sweep_expired_subscriptions],
+        max_instances=1, coalesce=True
+    )
+    # Same wall-clock time in every process, like the notification archiver
+    scheduler.add_job(
+        run_leased, 'cron', hour=4,
+        args=[RECONCILER_LEASE, owner, reconcile_stripe_subscriptions, RECONCILER_LEASE_TTL],
+        max_instances=1, coalesce=True
+    )
+    scheduler.start()
@@ -0,0 +1,40 @@
+# payment/management/commands/backfill_invoices.py
+import stripe
+from django.core.management.base import BaseCommand
+from payment.invoices import UPSERT_BATCH_SIZE, build_invoice, owners_by_subscription, upsert_invoices
+from payment.stripe_data import details_from_invoice, invoice_subscription_id
+
+
+class Command(BaseCommand):
+    help = "Copy invoices from Stripe into the local Invoice table (safe to re-run)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscription", help="Only this Stripe subscription id.")
+
+    def handle(self, *args, **options):
+        params = {"limit": 100}
+        if options["subscription"]:
+            params["subscription"] = options["subscription"]
+
+        total = 0
+        batch = []
+        for inv in stripe.Invoice.list(**params).auto_paging_iter():
+            batch.append(inv)
+            if len(batch) >= UPSERT_BATCH_SIZE:
+                total += self.save(batch)
+                batch = []
+        if batch:
+            total += self.save(batch)
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total} invoices"))
+
+    def save(self, batch):
+        # Owners not in the subscription metadata are resolved with one query per batch
+        owners = owners_by_subscription(
+            invoice_subscription_id(inv) for inv in batch if invoice_subscription_id(inv)
+        )
+        invoices = []
+        for inv in batch:
+            user_id = details_from_invoice(inv)["user_id"] or owners.get(invoice_subscription_id(inv))
+            invoices.append(build_invoice(inv, user_id))
+        upsert_invoices(invoices)
+        return len(invoices)
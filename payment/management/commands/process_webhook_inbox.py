@@ -0,0 +1,39 @@
+# payment/management/commands/process_webhook_inbox.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from notification.leases import acquire_lease, make_owner_id, release_lease
+from payment.jobs import WEBHOOK_INBOX_LEASE, process_webhook_inbox
+
+
+class Command(BaseCommand):
+    help = "Apply pending Stripe webhook events from the inbox, in order per subscription."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=int, default=settings.WEBHOOK_INBOX_INTERVAL,
+                            help="Seconds between passes.")
+        parser.add_argument("--workers", type=int, default=settings.WEBHOOK_INBOX_WORKERS,
+                            help="Subscriptions processed in parallel.")
+        parser.add_argument("--once", action="store_true", help="Run a single pass and exit.")
+
+    def handle(self, *args, **options):
+        owner = make_owner_id()
+        self.stdout.write(f"Webhook inbox worker {owner} started")
+
+        try:
+            while True:
+                started = time.monotonic()
+                if not acquire_lease(WEBHOOK_INBOX_LEASE, owner, settings.WEBHOOK_INBOX_LEASE_TTL):
+                    self.stdout.write("Lease held by another inbox worker, waiting")
+                else:
+                    process_webhook_inbox(workers=options["workers"], owner=owner)
+
+                if options["once"]:
+                    break
+                time.sleep(max(0, options["interval"] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            release_lease(WEBHOOK_INBOX_LEASE, owner)
+            self.stdout.write("Webhook inbox worker stopped")
@@ -0,0 +1,23 @@
+# payment/management/commands/reconcile_stripe_subscriptions.py
+import json
+
+from django.core.management.base import BaseCommand
+from payment.reconcile import RECONCILE_BATCH_SIZE, reconcile_subscriptions
+
+
+class Command(BaseCommand):
+    help = "Sync local subscriptions with Stripe (period, plan, status), for missed or out-of-order webhooks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report the differences without writing them.")
+        parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE, help="Rows per bulk_update.")
+
+    def handle(self, *args, **options):
+        report = reconcile_subscriptions(dry_run=options["dry_run"], batch_size=options["batch_size"])
+        self.stdout.write(json.dumps(report, indent=2, default=str))
+        verb = "would update" if options["dry_run"] else "updated"
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['stripe_subscriptions']} Stripe subscriptions: {report['updated']} {verb}, "
+            f"{report['unchanged']} unchanged, {report['not_in_local']} not in the local table, "
+            f"{report['not_in_stripe']} local rows not in Stripe"
+        ))
@@ -0,0 +1,15 @@
+# payment/management/commands/sweep_expired_subscriptions.py
+from django.core.management.base import BaseCommand
+from payment.jobs import sweep_expired_subscriptions
+
+
+class Command(BaseCommand):
+    help = "Deactivate subscriptions whose end date has passed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows per UPDATE.")
+        parser.add_argument("--budget", type=int, default=None, help="Seconds to keep sweeping.")
+
+    def handle(self, *args, **options):
+        deactivated = sweep_expired_subscriptions(batch_size=options["batch_size"], time_budget=options["budget"])
+        self.stdout.write(self.style.SUCCESS(f"Deactivated {deactivated} expired subscriptions"))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0008_webhookevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stripe_invoice_id', models.CharField(max_length=255, unique=True)),
+                ('stripe_subscription_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('status', models.CharField(blank=True, max_length=20, null=True)),
+                ('amount_paid', models.PositiveIntegerField(default=0)),
+                ('currency', models.CharField(blank=True, max_length=10, null=True)),
+                ('invoice_pdf', models.URLField(blank=True, max_length=1000, null=True)),
+                ('period_start', models.DateTimeField(blank=True, null=True)),
+                ('period_end', models.DateTimeField(blank=True, null=True)),
+                ('created', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='invoices', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created', '-id'], name='invoice_user_created_idx')],
+            },
+        ),
+    ]
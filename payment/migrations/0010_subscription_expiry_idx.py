@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0009_invoice'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['end_date'], name='subscription_expiry_idx'),
+        ),
+    ]
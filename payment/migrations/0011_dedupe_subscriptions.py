@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+
+def dedupe_subscriptions(apps, schema_editor):
+    """
+    Keep the best subscription of each user before the unique constraint: active
+    first, then premium, then the latest end_date, then the most recently updated.
+    The ids of the deleted rows are printed.
+    """
+    Subscription = apps.get_model('payment', 'Subscription')
+    duplicated = (
+        Subscription.objects.values('user_id').annotate(rows=Count('id')).filter(rows__gt=1)
+        .values_list('user_id', flat=True)
+    )
+    for user_id in duplicated.iterator():
+        rows = (
+            Subscription.objects.filter(user_id=user_id)
+            .annotate(premium=Case(When(status='premium', then=Value(1)), default=Value(0), output_field=IntegerField()))
+            .order_by('-is_active', '-premium', F('end_date').desc(nulls_last=True), '-updated_at', '-id')
+        )
+        keep, *drop = rows.values_list('id', flat=True)
+        Subscription.objects.filter(id__in=drop).delete()
+        print(f"User {user_id}: kept subscription {keep}, deleted duplicates {drop}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0010_subscription_expiry_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_subscriptions, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 from django.conf import settings
 from authentications.models import UserProfile
 
@@ -41,7 +43,7 @@ class Subscription(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='free')  # Free or Premium status
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     duration_days = models.PositiveIntegerField(default=30)  # default 1 month
-    start_date = models.DateTimeField(auto_now_add=True)
+    start_date = models.DateTimeField(default=timezone.now)  # settable, so upserts can write the Stripe period
     end_date = models.DateTimeField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     auto_renew = models.BooleanField(default=False)
@@ -49,8 +51,19 @@ class Subscription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # One subscription per user; webhook writes upsert on it (payment/subscriptions.py)
+            models.UniqueConstraint(fields=['user'], name='subscription_one_per_user'),
+        ]
+        indexes = [
+            # Expiry sweep (is_active=True, end_date <= now): end_date of the active rows only.
+            # is_active goes in the condition, not the columns, so the end_date range is searchable
+            # (a bare boolean filter is no equality match on a leading column for SQLite).
+            models.Index(fields=['end_date'], condition=Q(is_active=True), name='subscription_expiry_idx'),
+        ]
+
     def save(self, *args, **kwargs):
-        from django.utils import timezone
         if not self.end_date:
             # Determine the end date based on the subscription duration type
             if self.plan and self.plan.duration_type == 'monthly':
@@ -61,3 +74,56 @@ class Subscription(models.Model):
 
     def __str__(self):
         return f"{self.user.email} -  ({self.status.capitalize()})"
+
+
+# Webhook inbox: Stripe events are stored here on receipt and applied by the inbox worker
+class WebhookEvent(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)  # Stripe event ID, makes redeliveries no-ops
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    # Events with the same key are applied one at a time, in the order received
+    subscription_key = models.CharField(max_length=255, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)  # set when a failed attempt is to be retried
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='webhook_event_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id} ({self.status})"
+
+
+# Local copy of Stripe invoices, kept up to date by webhooks and the backfill_invoices command
+class Invoice(models.Model):
+    stripe_invoice_id = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='invoices', blank=True, null=True)
+    stripe_subscription_id = models.CharField(max_length=255, blank=True, null=True)
+    status = models.CharField(max_length=20, blank=True, null=True)  # draft, open, paid, void, uncollectible
+    amount_paid = models.PositiveIntegerField(default=0)  # in the smallest currency unit, as Stripe sends it
+    currency = models.CharField(max_length=10, blank=True, null=True)
+    invoice_pdf = models.URLField(max_length=1000, blank=True, null=True)
+    period_start = models.DateTimeField(blank=True, null=True)
+    period_end = models.DateTimeField(blank=True, null=True)
+    created = models.DateTimeField()  # when Stripe created the invoice
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Backs the newest-first invoice list of a user
+            models.Index(fields=['user', '-created', '-id'], name='invoice_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.stripe_invoice_id} ({self.status})"
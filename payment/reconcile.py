@@ -0,0 +1,127 @@
+# payment/reconcile.py
+"""
+Bring local Subscription rows back in line with Stripe after missed or
+out-of-order webhooks. Stripe is paged through once; local rows are loaded
+once and diffed in memory; the changed fields are written with bulk_update
+in batches.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+import stripe
+from django.utils import timezone
+
+from .models import Subscription, SubscriptionPlan
+from .stripe_data import details_from_subscription
+from .subscriptions import invalidate_subscription_caches
+
+# Stripe statuses in which the customer keeps access
+ACTIVE_STATUSES = {"active", "trialing", "past_due"}
+RECONCILED_FIELDS = ['plan', 'status', 'price', 'start_date', 'end_date', 'is_active', 'auto_renew']
+RECONCILE_BATCH_SIZE = 500
+SAMPLE_SIZE = 20  # changes listed in the report
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc) if value else None
+
+
+def expected_fields(stripe_subscription, plans_by_price):
+    """The local field values a Stripe subscription implies; plan stays None for unknown prices."""
+    details = details_from_subscription(stripe_subscription)
+    plan = plans_by_price.get(details["price_id"])
+    active = stripe_subscription.get("status") in ACTIVE_STATUSES
+    return {
+        'plan': plan,
+        'status': 'premium' if active else 'free',
+        'price': plan.amount if plan else None,
+        'start_date': _timestamp(details["period_start"]),
+        'end_date': _timestamp(details["period_end"]),
+        'is_active': active,
+        'auto_renew': not stripe_subscription.get("cancel_at_period_end", False),
+    }
+
+
+def diff_subscription(subscription, expected):
+    """{field: (local, stripe)} for the fields that differ; None values from Stripe are skipped."""
+    changes = {}
+    for field, value in expected.items():
+        if value is None:
+            continue
+        current = subscription.plan_id if field == 'plan' else getattr(subscription, field)
+        target = value.pk if field == 'plan' else value
+        if current != target:
+            changes[field] = (current, target)
+    return changes
+
+
+def reconcile_subscriptions(dry_run=False, batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Diff every Stripe subscription against the local row with the same
+    stripe_subscription_id and apply the differences (unless dry_run).
+    Returns a report dict with counts and a sample of the changes.
+    """
+    plans_by_price = {plan.price_id: plan for plan in SubscriptionPlan.objects.exclude(price_id=None)}
+    local = {
+        subscription.stripe_subscription_id: subscription
+        for subscription in Subscription.objects.exclude(stripe_subscription_id=None)
+        .only('id', 'user_id', 'stripe_subscription_id', *RECONCILED_FIELDS)
+        .iterator(chunk_size=2000)
+    }
+
+    report = {
+        "dry_run": dry_run, "stripe_subscriptions": 0, "unchanged": 0, "updated": 0,
+        "not_in_local": 0, "not_in_stripe": 0, "field_changes": Counter(), "sample": [],
+    }
+    # Rows to write, grouped by the fields that changed. Only those are written:
+    # the rows were read before paging Stripe, and their other fields may have
+    # been changed since (e.g. a renewal's end_date) by a webhook.
+    pending = defaultdict(list)
+    pending_count = 0
+
+    def flush():
+        nonlocal pending_count
+        now = timezone.now()
+        user_ids = set()
+        for fields, subscriptions in pending.items():
+            for subscription in subscriptions:
+                subscription.updated_at = now
+                user_ids.add(subscription.user_id)
+            Subscription.objects.bulk_update(subscriptions, [*fields, 'updated_at'], batch_size=batch_size)
+        invalidate_subscription_caches(user_ids)
+        pending.clear()
+        pending_count = 0
+
+    for stripe_subscription in stripe.Subscription.list(status="all", limit=100).auto_paging_iter():
+        report["stripe_subscriptions"] += 1
+        subscription = local.pop(stripe_subscription["id"], None)
+        if subscription is None:
+            report["not_in_local"] += 1
+            continue
+
+        changes = diff_subscription(subscription, expected_fields(stripe_subscription, plans_by_price))
+        if not changes:
+            report["unchanged"] += 1
+            continue
+
+        report["updated"] += 1
+        report["field_changes"].update(changes.keys())
+        if len(report["sample"]) < SAMPLE_SIZE:
+            report["sample"].append({"stripe_subscription_id": stripe_subscription["id"], "changes": changes})
+        if dry_run:
+            continue
+
+        for field, (_, value) in changes.items():
+            setattr(subscription, 'plan_id' if field == 'plan' else field, value)
+        pending[tuple(sorted(changes))].append(subscription)
+        pending_count += 1
+        if pending_count >= batch_size:
+            flush()
+
+    if pending:
+        flush()
+
+    # Left over: local rows whose Stripe subscription no longer exists. Reported, not changed.
+    report["not_in_stripe"] = len(local)
+    report["field_changes"] = dict(report["field_changes"])
+    return report
@@ -0,0 +1,21 @@
+# payment/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .models import Description, Subscription, SubscriptionPlan
+from .subscriptions import invalidate_subscription_caches
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+@receiver(post_delete, sender=SubscriptionPlan)
+@receiver(post_save, sender=Description)
+@receiver(post_delete, sender=Description)
+def invalidate_plan_catalog(sender, instance, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_subscription(sender, instance, **kwargs):
+    invalidate_subscription_caches([instance.user_id])
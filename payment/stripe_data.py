@@ -0,0 +1,137 @@
+# payment/stripe_data.py
+"""
+Subscription period, price and owner for webhook events, read from the event
+payload when it has them and from the Stripe API (behind a short TTL cache)
+otherwise. Counters show how many API calls were saved.
+"""
+import threading
+import time
+
+import stripe
+from django.conf import settings
+
+_lock = threading.Lock()
+_subscriptions = {}  # stripe subscription id -> (expires_at, subscription)
+counters = {"from_payload": 0, "from_cache": 0, "api_calls": 0}
+
+
+def _count(name):
+    with _lock:
+        counters[name] += 1
+
+
+def stats():
+    with _lock:
+        saved = counters["from_payload"] + counters["from_cache"]
+        lookups = saved + counters["api_calls"]
+        return {**counters, "saved_calls": saved, "saved_ratio": saved / lookups if lookups else 0}
+
+
+def retrieve_subscription(subscription_id):
+    """stripe.Subscription.retrieve, cached for STRIPE_SUBSCRIPTION_CACHE_TTL seconds."""
+    now = time.monotonic()
+    with _lock:
+        cached = _subscriptions.get(subscription_id)
+        if cached and cached[0] > now:
+            counters["from_cache"] += 1
+            return cached[1]
+
+    subscription = stripe.Subscription.retrieve(subscription_id)
+    with _lock:
+        counters["api_calls"] += 1
+        # Expired entries are dropped on write so the dict stays small
+        for key in [key for key, (expires_at, _) in _subscriptions.items() if expires_at <= now]:
+            del _subscriptions[key]
+        _subscriptions[subscription_id] = (now + settings.STRIPE_SUBSCRIPTION_CACHE_TTL, subscription)
+    return subscription
+
+
+def forget_subscription(subscription_id):
+    with _lock:
+        _subscriptions.pop(subscription_id, None)
+
+
+def _complete(details):
+    return all(details.get(field) for field in ("period_start", "period_end", "price_id", "user_id"))
+
+
+def details_from_subscription(subscription):
+    """{"period_start", "period_end", "price_id", "user_id"} of a Stripe subscription object."""
+    items = (subscription.get("items") or {}).get("data") or [{}]
+    item = items[0]
+    return {
+        "period_start": item.get("current_period_start") or subscription.get("current_period_start"),
+        "period_end": item.get("current_period_end") or subscription.get("current_period_end"),
+        "price_id": (item.get("price") or {}).get("id"),
+        "user_id": (subscription.get("metadata") or {}).get("user_id"),
+    }
+
+
+def _is_proration(line):
+    # Older API versions flag the line itself, newer ones its parent.subscription_item_details
+    item_details = (line.get("parent") or {}).get("subscription_item_details") or {}
+    return bool(line.get("proration") or item_details.get("proration"))
+
+
+def subscription_line(lines):
+    """
+    The invoice line carrying the subscription's current price and period. On a
+    plan change the invoice also has proration lines, and the "Unused time on
+    ..." credit among them has the old price and a partial period: the regular
+    line is preferred, else the prorated charge for the new price (whose period
+    is partial; details_from_invoice leaves it out).
+    """
+    candidates = [line for line in lines if line.get("subscription") or line.get("parent")] or lines
+    regular = [line for line in candidates if not _is_proration(line)]
+    if regular:
+        return regular[0]
+    charges = [line for line in candidates if (line.get("amount") or 0) > 0]
+    return charges[-1] if charges else candidates[0]
+
+
+def details_from_invoice(invoice):
+    """The same details from an invoice's subscription line and subscription metadata."""
+    lines = (invoice.get("lines") or {}).get("data") or [{}]
+    line = subscription_line(lines)
+    # A prorated period ends right but starts mid-cycle; without it the period comes from the API
+    period = {} if _is_proration(line) else line.get("period") or {}
+    price = line.get("price") or ((line.get("pricing") or {}).get("price_details") or {})
+    price_id = price.get("id") if "id" in price else price.get("price")
+
+    # Older API versions put the subscription's metadata at the top level,
+    # newer ones under parent.subscription_details
+    subscription_details = (
+        invoice.get("subscription_details")
+        or ((invoice.get("parent") or {}).get("subscription_details"))
+        or {}
+    )
+    return {
+        "period_start": period.get("start"),
+        "period_end": period.get("end"),
+        "price_id": price_id,
+        "user_id": (subscription_details.get("metadata") or {}).get("user_id")
+                   or (line.get("metadata") or {}).get("user_id"),
+    }
+
+
+def invoice_subscription_id(invoice):
+    """Subscription id of an invoice or checkout session, expanded or not."""
+    subscription_id = invoice.get("subscription")
+    if not subscription_id:
+        subscription_id = ((invoice.get("parent") or {}).get("subscription_details") or {}).get("subscription")
+    if isinstance(subscription_id, dict):
+        subscription_id = subscription_id.get("id")
+    return subscription_id
+
+
+def subscription_details(subscription_id, payload_details=None):
+    """
+    Details from the event payload when complete, else from the (cached) API.
+    Values present in the payload win over the API's, e.g. the user_id of a
+    checkout session.
+    """
+    payload_details = {key: value for key, value in (payload_details or {}).items() if value}
+    if _complete(payload_details):
+        _count("from_payload")
+        return payload_details
+    return {**details_from_subscription(retrieve_subscription(subscription_id)), **payload_details}
@@ -0,0 +1,70 @@
+# payment/subscriptions.py
+"""
+The one-per-user Subscription access layer: a per-request read accessor and
+single-statement writes, each followed by invalidate_subscription_caches.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+from authentications.tokens import bump_entitlement_versions
+from chatbot.ratelimit import PLAN_TIER_KEY
+from chatbot.user_context import cache_key as user_context_key
+from .models import Subscription
+
+UPSERT_FIELDS = [
+    'plan', 'stripe_subscription_id', 'status', 'price', 'start_date', 'end_date', 'is_active', 'updated_at',
+]
+
+
+def get_user_subscription(user):
+    """
+    The user's Subscription (plan loaded) or None, memoized on the user object
+    for the rest of the request. Not kept across requests: writes often happen
+    in another process (webhook inbox, sweeper), whose invalidation can't reach
+    this process's cache.
+    """
+    if not hasattr(user, '_subscription_cache'):
+        user._subscription_cache = Subscription.objects.select_related('plan').filter(user_id=user.pk).first()
+    return user._subscription_cache
+
+
+def invalidate_subscription_caches(user_ids):
+    """
+    Drop what this process caches per user about the subscription (the
+    chatbot plan tier and context) and invalidate the entitlement claims of
+    their tokens. Writes that skip save() must call this themselves.
+    """
+    user_ids = list(user_ids)
+    keys = [PLAN_TIER_KEY.format(user_id) for user_id in user_ids]
+    keys += [user_context_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    bump_entitlement_versions(user_ids)
+
+
+def upsert_subscription(user_id, **fields):
+    """Create or overwrite the user's subscription in one INSERT ... ON CONFLICT (user)."""
+    fields.setdefault('start_date', timezone.now())
+    Subscription.objects.bulk_create(
+        [Subscription(user_id=user_id, **fields)],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=[field for field in UPSERT_FIELDS if field in fields or field == 'updated_at'],
+    )
+    invalidate_subscription_caches([user_id])
+
+
+def update_subscription(user_id, **fields):
+    """Change the user's existing subscription in one UPDATE; returns False if there is none."""
+    updated = Subscription.objects.filter(user_id=user_id).update(updated_at=timezone.now(), **fields)
+    if updated:
+        invalidate_subscription_caches([user_id])
+    return bool(updated)
+
+
+def deactivate_subscription(user_id):
+    updated = Subscription.objects.filter(user_id=user_id, is_active=True).update(
+        is_active=False, updated_at=timezone.now()
+    )
+    if updated:
+        invalidate_subscription_caches([user_id])
+    return bool(updated)
@@ -1,3 +1,104 @@
-from django.test import TestCase
+import io
+import time
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+import stripe
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from authentications.models import CustomUser
+from .fake_stripe import fake_subscription, start_fake_stripe_server
+from .models import Subscription, SubscriptionPlan
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ReconcileStripeSubscriptionsTests(TestCase):
+    def setUp(self):
+        self.monthly = SubscriptionPlan.objects.create(name='Monthly', amount=10, price_id='price_monthly')
+        self.yearly = SubscriptionPlan.objects.create(name='Yearly', amount=100, price_id='price_yearly')
+        self.period_start = int(time.time()) - 86400
+
+        self.remote = []
+        for index in range(5):
+            user = CustomUser.objects.create_user(email=f'user{index}@example.com', password='pass')
+            remote = fake_subscription(f'sub_{index}', 'price_monthly', user.id, period_start=self.period_start)
+            self.remote.append(remote)
+            Subscription.objects.create(
+                user=user,
+                plan=self.monthly,
+                stripe_subscription_id=f'sub_{index}',
+                status='premium',
+                price=10,
+                start_date=self.at(self.period_start),
+                end_date=self.at(self.period_start + 30 * 86400),
+                auto_renew=True,
+            )
+
+        # Stripe moved on without us: an upgrade, a cancellation and a subscription we never stored
+        self.remote[1] = fake_subscription('sub_1', 'price_yearly', period_start=self.period_start, days=365)
+        self.remote[2] = fake_subscription('sub_2', 'price_monthly', status='canceled', period_start=self.period_start)
+        self.remote.append(fake_subscription('sub_unknown', 'price_monthly', period_start=self.period_start))
+
+        self.server, api_base = start_fake_stripe_server(self.remote)
+        self.previous = stripe.api_base, stripe.api_key
+        stripe.api_base, stripe.api_key = api_base, 'sk_test_fake'
+
+    def tearDown(self):
+        stripe.api_base, stripe.api_key = self.previous
+        self.server.shutdown()
+
+    @staticmethod
+    def at(timestamp):
+        return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command('reconcile_stripe_subscriptions', '--batch-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_without_writing(self):
+        output = self.reconcile('--dry-run')
+
+        self.assertIn('6 Stripe subscriptions: 2 would update, 3 unchanged, 1 not in the local table', output)
+        upgraded = Subscription.objects.get(stripe_subscription_id='sub_1')
+        self.assertEqual(upgraded.plan, self.monthly)
+
+    def test_applies_stripe_state(self):
+        output = self.reconcile()
+
+        self.assertIn('2 updated, 3 unchanged', output)
+        upgraded = Subscription.objects.get(stripe_subscription_id='sub_1')
+        self.assertEqual(upgraded.plan, self.yearly)
+        self.assertEqual(upgraded.price, 100)
+        self.assertEqual(upgraded.end_date, self.at(self.period_start + 365 * 86400))
+        canceled = Subscription.objects.get(stripe_subscription_id='sub_2')
+        self.assertFalse(canceled.is_active)
+        self.assertEqual(canceled.status, 'free')
+
+        # A second run finds nothing left to change
+        self.assertIn('0 updated, 5 unchanged', self.reconcile())
+
+    def test_keeps_fields_changed_during_the_run(self):
+        listing = stripe.Subscription.list
+
+        def list_after_local_change(**params):
+            # A webhook writes to sub_1 after the local rows were loaded, while Stripe is paged
+            Subscription.objects.filter(stripe_subscription_id='sub_1').update(auto_renew=False)
+            return listing(**params)
+
+        with mock.patch.object(stripe.Subscription, 'list', side_effect=list_after_local_change):
+            self.reconcile()
+
+        upgraded = Subscription.objects.get(stripe_subscription_id='sub_1')
+        self.assertEqual(upgraded.plan, self.yearly)
+        self.assertFalse(upgraded.auto_renew)
+
+    def test_pages_through_stripe(self):
+        self.remote.extend(fake_subscription(f'sub_extra_{index}', 'price_monthly') for index in range(250))
+        self.server.positions = {subscription['id']: index for index, subscription in enumerate(self.remote)}
+
+        output = self.reconcile('--dry-run')
+
+        self.assertIn('256 Stripe subscriptions', output)
+        self.assertEqual(self.server.requests, 3)  # 100 per page
@@ -10,5 +10,6 @@ urlpatterns = [
     path("cancel/", views.checkout_cencel, name="checkout_cancel"),
     path("me/", views.get_subscription_invoices, name="get_subscription_invoices"),
     path("all-plan/", views.get_all_plan, name="get_all_plan"),
+    path("subscriptions/export/", views.export_subscriptions, name="export_subscriptions"),
 
 ]
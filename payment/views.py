@@ -4,20 +4,26 @@ from rest_framework import status
 # Create your views here.
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
-from django.shortcuts import get_object_or_404
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import authentication_classes, permission_classes
+from rest_framework.utils.urls import remove_query_param
 # Create your views here.
 import stripe
 from rest_framework.response import Response
 from django.http import JsonResponse , HttpResponse
 from collections import defaultdict
+from django.db.models import F
+from sara_main.utils import EXPORT_CHUNK_SIZE, error_response, streaming_export
 from datetime import datetime
-from .models import Subscription , SubscriptionPlan
-from authentications.models import  CustomUser
+from .models import Invoice, Subscription , SubscriptionPlan
 from .serializers import *
+from .catalog import etag_matches, get_plan_catalog
+from .invoices import sync_invoices
+from .pagination import InvoicePagination
+from .subscriptions import get_user_subscription
+from .webhooks import record_event
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -60,6 +66,8 @@ def create_checkout_session(request):
                 "user_id": str(user.id),  # Include the user ID for tracking
                 "custom_note": "Tracking payment for subscription",
             },
+            # Copied onto the subscription, so its invoices and events carry the user too
+            subscription_data={"metadata": {"user_id": str(user.id)}},
         )
 
         return Response({"checkout_url": session.url}, status=200)
@@ -72,6 +80,11 @@ def create_checkout_session(request):
 
 @api_view(["POST"])
 def stripe_webhook(request):
+    """
+    Verify the event and store it in the webhook inbox; the inbox worker
+    (payment/jobs.py) applies it. Redelivered events are acknowledged again
+    without being stored twice.
+    """
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
 
@@ -83,111 +96,8 @@ def stripe_webhook(request):
         print(f"Error verifying webhook signature: {str(e)}")
         return Response({"error": "Webhook signature failed"}, status=400)
 
-    # Rest of your webhook logic remains unchanged
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
-        print(f"Session completed: {session}")
-        metadata = session.get("metadata", {})
-        user_id = metadata.get("user_id")
-        stripe_subscription_id = session.get("subscription")
-
-        if not user_id or not stripe_subscription_id:
-            print(f"Missing user_id or subscription_id in metadata: {metadata}")
-            return Response({"error": "Missing user_id or subscription_id"}, status=400)
-
-        try:
-            user = get_object_or_404(CustomUser, id=user_id)
-            stripe_subscription = stripe.Subscription.retrieve(stripe_subscription_id)
-            subscription_item = stripe_subscription["items"]["data"][0]
- 
-            current_period_start = subscription_item.get("current_period_start")
-            current_period_end = subscription_item.get("current_period_end")
-
-            if not current_period_start or not current_period_end:
-                print(f"Missing subscription period data: {stripe_subscription}")
-                return Response({"error": "Missing subscription period information from Stripe"}, status=400)
-
-            current_period_start = datetime.fromtimestamp(current_period_start)
-            current_period_end = datetime.fromtimestamp(current_period_end)
-            print(f"current_period_start: {current_period_start}, current_period_end: {current_period_end}")
-
-            plan_id = subscription_item["price"]["id"]
-            subscription_plan = get_object_or_404(SubscriptionPlan, price_id=plan_id)
-
-            try:
-                subscription = Subscription.objects.get(user=user)
-                subscription.start_date = current_period_start
-                subscription.end_date = current_period_end
-                subscription.is_active = True
-                subscription.plan = subscription_plan
-                subscription.price = subscription_plan.amount
-                subscription.status = "premium"
-                subscription.stripe_subscription_id = stripe_subscription_id
-                subscription.save()
-            except Subscription.DoesNotExist:
-                Subscription.objects.create(
-                    user=user,
-                    plan=subscription_plan,
-                    start_date=current_period_start,
-                    end_date=current_period_end,
-                    is_active=True,
-                    price=subscription_plan.amount,
-                    status="premium",
-                    stripe_subscription_id=stripe_subscription_id
-                )
-        except Exception as e:
-            print(f"Error processing subscription for user {user_id}: {str(e)}")
-            return Response({"error": "Error processing subscription"}, status=400)
-
-    elif event["type"] == "invoice.payment_failed" or event["type"] == "customer.subscription.deleted":
-        session = event["data"]["object"]
-        metadata = session.get("metadata", {})
-        user_id = metadata.get("user_id")
-
-        if user_id:
-            try:
-                user = get_object_or_404(CustomUser, id=user_id)
-                subscription = Subscription.objects.get(user=user)
-                subscription.is_active = False
-                subscription.save()
-            except Subscription.DoesNotExist:
-                pass
-    elif event["type"] == "invoice.paid":
-        invoice = event["data"]["object"]
-        subscription_id = invoice.get("subscription")
-
-        try:
-            stripe_subscription = stripe.Subscription.retrieve(subscription_id)
-            user_id = stripe_subscription.get("metadata", {}).get("user_id")
-
-            if not user_id:
-                print(f"Missing user_id in metadata for renewal: {stripe_subscription}")
-                return Response({"error": "Missing user_id for renewal"}, status=400)
-
-            user = get_object_or_404(CustomUser, id=user_id)
-
-            subscription_item = stripe_subscription["items"]["data"][0]
-            current_period_start = datetime.fromtimestamp(subscription_item["current_period_start"])
-            current_period_end = datetime.fromtimestamp(subscription_item["current_period_end"])
-
-            plan_id = subscription_item["price"]["id"]
-            subscription_plan = get_object_or_404(SubscriptionPlan, price_id=plan_id)
-
-            # Update subscription for renewal
-            subscription = Subscription.objects.get(user=user)
-            subscription.start_date = current_period_start
-            subscription.end_date = current_period_end
-            subscription.plan = subscription_plan
-            subscription.price = subscription_plan.amount
-            subscription.status = "premium"
-            subscription.is_active = True
-            subscription.save()
-
-            print(f"Subscription renewed for user {user.email}")
-
-        except Exception as e:
-            print(f"Error processing renewal for subscription {subscription_id}: {str(e)}")
-            return Response({"error": "Error processing renewal"}, status=400)
+    if not record_event(event):
+        print(f"Duplicate webhook event {event['id']} ignored")
 
     return Response({"status": "success"}, status=200)
 
@@ -207,14 +117,11 @@ def get_subscription(request):
     """
     Retrieve the subscription details for the authenticated user.
     """
-    user = request.user
-    try:
-        # Retrieve subscription for the current user
-        subscription = Subscription.objects.get(user=user)
-        serializer = SubscriptionSerializer(subscription)
-        return Response({"subscription": serializer.data}, status=200)
-    except Subscription.DoesNotExist:
+    subscription = get_user_subscription(request.user)
+    if subscription is None:
         return Response({"message": "No subscription found for this user."}, status=404)
+    serializer = SubscriptionSerializer(subscription)
+    return Response({"subscription": serializer.data}, status=200)
 
 
 
@@ -226,77 +133,89 @@ def get_all_subscription(request):
     return Response({"subscriptions": serializer.data}, status=200)
 
 
+SUBSCRIPTION_EXPORT_FIELDS = [
+    'id', 'user_id', 'user_email', 'plan_name', 'status', 'price', 'start_date', 'end_date',
+    'is_active', 'auto_renew', 'stripe_subscription_id',
+]
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_subscriptions(request):
+    """
+    Stream every subscription as CSV (?output=csv) or NDJSON (default), reading
+    the table in chunks so memory stays flat however many rows there are.
+    """
+    export_format = request.query_params.get('output', 'ndjson')
+    if export_format not in ('csv', 'ndjson'):
+        return error_response(code=400, details={"output": ["Must be csv or ndjson"]})
+
+    rows = Subscription.objects.order_by('id').annotate(
+        user_email=F('user__email'),
+        plan_name=F('plan__name'),
+    ).values(*SUBSCRIPTION_EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return streaming_export(rows, SUBSCRIPTION_EXPORT_FIELDS, export_format, 'subscriptions')
+
+
 @api_view(['GET'])
 def get_all_plan(request):
-    plans = SubscriptionPlan.objects.all()
-    serializer = SubscriptionPlanSerializer(plans, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    """
+    The plan catalog, served from the cache and rebuilt only after a plan or
+    description changes. Clients sending the ETag back get a 304.
+    """
+    data, etag = get_plan_catalog()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}  # always revalidate, usually for a 304
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(data, status=status.HTTP_200_OK, headers=headers)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_subscription_invoices(request):
+    """
+    The user's invoices, newest first, from the local Invoice table
+    (?page=, ?page_size=). ?refresh=true first re-syncs them from Stripe.
+    """
     user = request.user
+    subscription = get_user_subscription(user)
 
-    try:
-        subscription = Subscription.objects.get(user=user)
-        stripe_subscription_id = subscription.stripe_subscription_id
-
-        period_end = subscription.end_date.strftime('%m/%d/%Y') if subscription.end_date else None
-
-        invoices = stripe.Invoice.list(subscription=stripe_subscription_id)
-        print("invoices",len(invoices))
-
-        invoice_data = []
-        for inv in invoices.auto_paging_iter():
-            invoice_data.append({
-                "plan": subscription.plan.name,
-                "issue_date": datetime.fromtimestamp(inv.created).strftime('%m/%d/%Y'),
-                "expire_date": period_end,
-                "amount": f"${inv.amount_paid / 100:.2f}",
-                "invoice_pdf": inv.invoice_pdf
-            })
-
-        return Response({"invoices": invoice_data}, status=200)
-
-    except Subscription.DoesNotExist:
-        # Return empty invoices list instead of 404
-        return Response({"invoices": []}, status=200)
-    except Exception as e:
-        print("Error:", str(e))
-        return Response({"error": str(e)}, status=500)
-
-
-
-
+    if request.query_params.get('refresh') == 'true' and subscription and subscription.stripe_subscription_id:
+        try:
+            sync_invoices(user, subscription.stripe_subscription_id)
+        except stripe.error.StripeError as e:
+            print("Error:", str(e))
+            return Response({"error": str(e)}, status=502)
+
+    period_end = subscription.end_date.strftime('%m/%d/%Y') if subscription and subscription.end_date else None
+    plan_name = subscription.plan.name if subscription and subscription.plan else None
+
+    paginator = InvoicePagination()
+    invoices = paginator.paginate_queryset(
+        Invoice.objects.filter(user=user).order_by('-created', '-id'), request
+    )
+    invoice_data = [
+        {
+            "plan": plan_name,
+            "issue_date": inv.created.strftime('%m/%d/%Y'),
+            "expire_date": inv.period_end.strftime('%m/%d/%Y') if inv.period_end else period_end,
+            "amount": f"${inv.amount_paid / 100:.2f}",
+            "invoice_pdf": inv.invoice_pdf,
+        }
+        for inv in invoices
+    ]
+
+    # Following a page link must not trigger another sync
+    next_link, previous_link = paginator.get_next_link(), paginator.get_previous_link()
+    return Response({
+        "count": paginator.page.paginator.count,
+        "next": remove_query_param(next_link, 'refresh') if next_link else None,
+        "previous": remove_query_param(previous_link, 'refresh') if previous_link else None,
+        "invoices": invoice_data,
+    }, status=200)
 
-# @background(schedule=60)  # Check every 60 seconds (adjust as needed)
-# def check_subscription_status():
-#     """
-#     Automatically check and deactivate expired free trials or subscriptions.
-#     """
-#     now = datetime.now()
 
-#     # Check for expired free trials
-#     free_trial_expired = Subscription.objects.filter(
-#         free_trial=True, free_trial_end__lte=now
-#     )
-#     for subscription in free_trial_expired:
-#         subscription.free_trial = False
-#         subscription.save()
-#         print(f"Free trial expired for user {subscription.user.username}")
 
-#     # Check for expired subscriptions
-#     subscription_expired = Subscription.objects.filter(
-#         is_active=True, end_date__lte=now
-#     )
-#     for subscription in subscription_expired:
-#         subscription.is_active = False
-#         subscription.save()
-#         print(f"Subscription expired for user {subscription.user.username}")
 
-#     print("Checked free trial and subscription statuses.")
-    
-    
 
 # @api_view(['GET'])
 
@@ -0,0 +1,174 @@
+# payment/webhooks.py
+"""
+Stripe webhook inbox. The view only verifies and records events (record_event);
+the inbox worker applies them (process_event) in order per subscription.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+
+from authentications.models import CustomUser
+from .invoices import record_invoice
+from .models import SubscriptionPlan, WebhookEvent
+from .stripe_data import (
+    details_from_invoice,
+    details_from_subscription,
+    forget_subscription,
+    invoice_subscription_id,
+    subscription_details,
+)
+from .subscriptions import deactivate_subscription, update_subscription, upsert_subscription
+
+
+class WebhookError(Exception):
+    """The event can never be applied (missing data, unknown user or plan); not retried."""
+
+
+class WebhookRetry(Exception):
+    """
+    The event can't be applied yet, e.g. a renewal that arrived before the
+    checkout creating the subscription; retried with backoff.
+    """
+
+
+def subscription_key(event):
+    """Events touching the same Stripe subscription share a key and are applied in order."""
+    obj = event["data"]["object"]
+    if event["type"].startswith("customer.subscription."):
+        return obj.get("id")
+    subscription_id = invoice_subscription_id(obj)  # also covers checkout sessions
+    if subscription_id:
+        return subscription_id
+    user_id = (obj.get("metadata") or {}).get("user_id")
+    if user_id:
+        return f"user:{user_id}"
+    return f"event:{event['id']}"
+
+
+def record_event(event):
+    """Store a verified event in the inbox. Returns False if it was already recorded."""
+    try:
+        with transaction.atomic():
+            WebhookEvent.objects.create(
+                event_id=event["id"],
+                type=event["type"],
+                payload=event.to_dict() if hasattr(event, "to_dict") else event,
+                subscription_key=subscription_key(event),
+            )
+        return True
+    except IntegrityError:
+        # Stripe redelivered an event we already have
+        return False
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+
+
+def _get_user(user_id):
+    try:
+        return CustomUser.objects.get(id=user_id)
+    except (CustomUser.DoesNotExist, ValueError):
+        raise WebhookError(f"Unknown user {user_id}")
+
+
+def _get_plan(price_id):
+    try:
+        return SubscriptionPlan.objects.get(price_id=price_id)
+    except SubscriptionPlan.DoesNotExist:
+        raise WebhookError(f"No plan for price {price_id}")
+
+
+def _activate(user, details, stripe_subscription_id=None):
+    """
+    Write the paid period to the user's subscription in one statement: an upsert
+    for a new Stripe subscription, an UPDATE of the existing row for a renewal.
+    """
+    if not details["period_start"] or not details["period_end"]:
+        raise WebhookError("Missing subscription period information from Stripe")
+
+    subscription_plan = _get_plan(details["price_id"])
+    fields = {
+        "start_date": _timestamp(details["period_start"]),
+        "end_date": _timestamp(details["period_end"]),
+        "is_active": True,
+        "plan": subscription_plan,
+        "price": subscription_plan.amount,
+        "status": "premium",
+    }
+    if stripe_subscription_id:
+        upsert_subscription(user.id, stripe_subscription_id=stripe_subscription_id, **fields)
+    elif not update_subscription(user.id, **fields):
+        raise WebhookRetry(f"No subscription to renew for user {user.id}")
+
+
+def handle_checkout_completed(obj):
+    user_id = (obj.get("metadata") or {}).get("user_id")
+    stripe_subscription = obj.get("subscription")
+    if not user_id or not stripe_subscription:
+        raise WebhookError("Missing user_id or subscription_id")
+
+    # Only an expanded subscription carries its period and price
+    payload_details = {"user_id": user_id}
+    if isinstance(stripe_subscription, dict):
+        payload_details = {**details_from_subscription(stripe_subscription), **payload_details}
+        stripe_subscription = stripe_subscription["id"]
+
+    user = _get_user(user_id)
+    _activate(user, subscription_details(stripe_subscription, payload_details), stripe_subscription)
+
+
+def handle_subscription_ended(obj):
+    user_id = (obj.get("metadata") or {}).get("user_id")
+    if obj.get("object") == "subscription":
+        forget_subscription(obj.get("id"))
+    if not user_id:
+        return
+    deactivate_subscription(user_id)
+
+
+def handle_invoice_paid(obj):
+    # Mirrored first, so the invoice is listed whatever happens to the renewal
+    user_id = record_invoice(obj)
+    stripe_subscription_id = invoice_subscription_id(obj)
+    if not stripe_subscription_id:
+        return  # a one-off invoice, nothing to renew
+
+    details = subscription_details(stripe_subscription_id, {**details_from_invoice(obj), "user_id": user_id})
+    if not details.get("user_id"):
+        # Neither metadata nor a local row: only the checkout.session.completed
+        # queued behind this event can tell whose subscription it is, and it
+        # activates the same period
+        print(f"Invoice {obj.get('id')} paid for unknown subscription {stripe_subscription_id}, not renewed")
+        return
+
+    user = _get_user(details["user_id"])
+    # With the subscription id this is an upsert, so a first invoice handled
+    # before its checkout event creates the row instead of waiting for it
+    _activate(user, details, stripe_subscription_id)
+    print(f"Subscription renewed for user {user.id}")
+
+
+def handle_invoice_created(obj):
+    record_invoice(obj)
+
+
+def handle_invoice_payment_failed(obj):
+    record_invoice(obj)
+    handle_subscription_ended(obj)
+
+
+HANDLERS = {
+    "checkout.session.completed": handle_checkout_completed,
+    "invoice.created": handle_invoice_created,
+    "invoice.payment_failed": handle_invoice_payment_failed,
+    "customer.subscription.deleted": handle_subscription_ended,
+    "invoice.paid": handle_invoice_paid,
+}
+
+
+def process_event(webhook_event):
+    """Apply one inbox event; raises on failure so the caller can record it."""
+    handler = HANDLERS.get(webhook_event.type)
+    if handler:
+        handler(webhook_event.payload["data"]["object"])
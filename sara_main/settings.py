@@ -178,3 +178,68 @@ EMAIL_HOST_USER = 'hijabpoint374@gmail.com'
 EMAIL_HOST_PASSWORD = 'sbog hrdj icpg zodj'  # Ensure this is correct
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+
+
+# Notification dispatcher
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", 1000))  # rows claimed per UPDATE
+NOTIFICATION_CLAIM_TIMEOUT = int(os.getenv("NOTIFICATION_CLAIM_TIMEOUT", 300))  # seconds before a stuck claim is retried
+NOTIFICATION_TICK_BUDGET = int(os.getenv("NOTIFICATION_TICK_BUDGET", 50))  # seconds one tick may keep claiming batches
+# "lease": every process runs a scheduler but only the lease holder dispatches.
+# "off": no in-process scheduler, run `manage.py run_notification_dispatcher` instead.
+NOTIFICATION_SCHEDULER_MODE = os.getenv("NOTIFICATION_SCHEDULER_MODE", "lease")
+NOTIFICATION_LEASE_TTL = int(os.getenv("NOTIFICATION_LEASE_TTL", 180))  # seconds, must exceed the tick interval
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", 30))  # sent notifications older than this are archived
+FCM_ASYNC_CONCURRENCY = int(os.getenv("FCM_ASYNC_CONCURRENCY", 100))  # concurrent sends / pooled connections in the async FCM sender
+FCM_MAX_RETRIES = int(os.getenv("FCM_MAX_RETRIES", 3))  # retries for transient FCM failures
+FCM_RETRY_BACKOFF = float(os.getenv("FCM_RETRY_BACKOFF", 0.5))  # seconds, doubled per retry
+
+
+# Booking reminders, per booking_type with an optional "default" entry, e.g.
+# {"flight": {"lead_hours": 48, "interval_hours": 12, "count": 4}}
+# Missing keys fall back to booking.reminders.DEFAULT_REMINDER_POLICY.
+BOOKING_REMINDER_POLICIES = {}
+BOOKING_IMPORT_MAX = 1000  # bookings accepted per bulk import request
+
+
+# Chatbot
+CHATBOT_MODEL = os.getenv("CHATBOT_MODEL", "gpt-4o-mini")
+CHATBOT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHATBOT_CONTEXT_TOKEN_BUDGET", 3000))  # prompt tokens for history
+CHATBOT_SUMMARY_MAX_TOKENS = int(os.getenv("CHATBOT_SUMMARY_MAX_TOKENS", 200))  # length of the rolling summary
+CHATBOT_MAX_CONNECTIONS = int(os.getenv("CHATBOT_MAX_CONNECTIONS", 50))  # pooled connections to OpenAI per process
+CHATBOT_MAX_CONCURRENCY = int(os.getenv("CHATBOT_MAX_CONCURRENCY", 50))  # in-flight async chats per process
+CHATBOT_MAX_QUEUE = int(os.getenv("CHATBOT_MAX_QUEUE", 500))  # chats allowed to wait for a slot
+CHATBOT_QUEUE_TIMEOUT = float(os.getenv("CHATBOT_QUEUE_TIMEOUT", 30))  # seconds a chat may wait for a slot
+CHATBOT_CACHE_MAX_ENTRIES = int(os.getenv("CHATBOT_CACHE_MAX_ENTRIES", 1000))  # cached replies per process (LRU)
+CHATBOT_CACHE_TTL = int(os.getenv("CHATBOT_CACHE_TTL", 3600))  # seconds a cached reply is served
+CHATBOT_SEMANTIC_CACHE = os.getenv("CHATBOT_SEMANTIC_CACHE", "false").lower() == "true"  # embedding tier, needs numpy
+CHATBOT_SEMANTIC_THRESHOLD = float(os.getenv("CHATBOT_SEMANTIC_THRESHOLD", 0.92))  # cosine similarity for a semantic hit
+CHATBOT_EMBEDDING_MODEL = os.getenv("CHATBOT_EMBEDDING_MODEL", "text-embedding-3-small")
+CHATBOT_CONTEXT_BOOKINGS = int(os.getenv("CHATBOT_CONTEXT_BOOKINGS", 5))  # upcoming bookings in the system prompt
+# Seconds the cached user context is kept. Invalidation only reaches the process that made the
+# change (the cache is per-process LocMem), so this bounds how stale other workers can be.
+CHATBOT_USER_CONTEXT_TTL = int(os.getenv("CHATBOT_USER_CONTEXT_TTL", 300))
+# Token buckets per caller of the chat views: sustained calls per minute and burst size
+CHATBOT_RATE_LIMITS = {
+    "anonymous": {"per_minute": int(os.getenv("CHATBOT_RATE_ANONYMOUS", 5)), "burst": 5},
+    "free": {"per_minute": int(os.getenv("CHATBOT_RATE_FREE", 10)), "burst": 10},
+    "premium": {"per_minute": int(os.getenv("CHATBOT_RATE_PREMIUM", 60)), "burst": 20},
+}
+# chatbot.ratelimit.CacheTokenBucketBackend shares the buckets through the Django cache
+CHATBOT_RATE_LIMIT_BACKEND = os.getenv("CHATBOT_RATE_LIMIT_BACKEND", "chatbot.ratelimit.LocalTokenBucketBackend")
+CHATBOT_PLAN_TIER_TTL = int(os.getenv("CHATBOT_PLAN_TIER_TTL", 300))  # seconds a user's cached plan tier is kept
+
+
+# Payment webhooks
+# "lease": the inbox is processed in the web process holding the lease; "off": only via
+# `manage.py process_webhook_inbox`
+WEBHOOK_SCHEDULER_MODE = os.getenv("WEBHOOK_SCHEDULER_MODE", "lease")
+WEBHOOK_INBOX_INTERVAL = int(os.getenv("WEBHOOK_INBOX_INTERVAL", 10))  # seconds between inbox passes
+WEBHOOK_INBOX_WORKERS = int(os.getenv("WEBHOOK_INBOX_WORKERS", 4))  # subscriptions processed in parallel
+WEBHOOK_INBOX_BATCH_SIZE = int(os.getenv("WEBHOOK_INBOX_BATCH_SIZE", 500))  # pending events read per pass
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 5))  # tries before an event is marked failed
+WEBHOOK_RETRY_BACKOFF = int(os.getenv("WEBHOOK_RETRY_BACKOFF", 30))  # seconds before the first retry, doubled per attempt
+WEBHOOK_INBOX_LEASE_TTL = int(os.getenv("WEBHOOK_INBOX_LEASE_TTL", 120))  # seconds, renewed while a pass is running
+PLAN_CATALOG_TTL = int(os.getenv("PLAN_CATALOG_TTL", 60))  # seconds other processes may serve the plan list after an edit
+STRIPE_SUBSCRIPTION_CACHE_TTL = int(os.getenv("STRIPE_SUBSCRIPTION_CACHE_TTL", 60))  # seconds a retrieved subscription is reused
+SUBSCRIPTION_SWEEP_BATCH_SIZE = int(os.getenv("SUBSCRIPTION_SWEEP_BATCH_SIZE", 1000))  # subscriptions deactivated per UPDATE
+SUBSCRIPTION_SWEEP_BUDGET = int(os.getenv("SUBSCRIPTION_SWEEP_BUDGET", 60))  # seconds one sweep may keep updating batches
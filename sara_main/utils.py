@@ -1,5 +1,13 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from rest_framework.response import Response
 
+EXPORT_CHUNK_SIZE = 2000  # rows fetched per round trip when streaming exports
+
+
 def error_response(code, message=None, details=None):
     """
     Generate a standardized error response with a user-friendly message.
@@ -36,4 +44,42 @@ def error_response(code, message=None, details=None):
         "code": code,
         "message": message,
         "details": details if details else {}
-    }, status=code)
\ No newline at end of file
+    }, status=code)
+
+
+class _Echo:
+    """File-like object whose write() hands the line back, so csv.writer output can be streamed."""
+    def write(self, value):
+        return value
+
+
+def streaming_export(rows, fieldnames, export_format, filename):
+    """
+    Stream an iterable of dicts as CSV or NDJSON without building the whole body in memory.
+    Args:
+        rows (iterable): Dicts keyed by fieldnames, e.g. queryset.values(...).iterator(chunk_size=...).
+        fieldnames (list): Columns, in order.
+        export_format (str): "csv" or "ndjson".
+        filename (str): Download name without extension.
+    Returns:
+        StreamingHttpResponse
+    """
+    if export_format == "csv":
+        writer = csv.DictWriter(_Echo(), fieldnames=fieldnames)
+
+        def generate():
+            yield writer.writeheader()
+            for row in rows:
+                yield writer.writerow(row)
+
+        content_type = "text/csv"
+    else:
+        def generate():
+            for row in rows:
+                yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+        content_type = "application/x-ndjson"
+
+    response = StreamingHttpResponse(generate(), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{export_format}"'
+    return response